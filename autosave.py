@@ -0,0 +1,230 @@
+"""Crash-safe autosave: an append-only journal of document edits.
+
+Each editing session owns a directory of numbered generations.
+``base.<n>.md`` is a full snapshot written with ``atomic_write`` and
+``journal.<n>.log`` holds the edits made after it, one JSON record per line:
+``[position, removed, added]`` with positions and counts in UTF-16 code
+units, the way QTextDocument reports them. Compaction sends records to
+journal n+1 at once; closing journal n and writing base n+1 are left to a
+worker thread, and generation n is deleted only after that. Recovery takes the newest base on disk and replays
+every journal from its generation on, so a crash at any point loses at most
+the last unflushed batch. No Qt dependency.
+"""
+import json
+import os
+import re
+import shutil
+import stat
+import threading
+import uuid
+
+from paths import user_config_dir
+
+SESSION_FILE = 'session.json'
+GENERATION_RE = re.compile(r'^(base|journal)\.(\d+)\.(md|log)$')
+
+
+def default_autosave_dir():
+    path = os.path.join(user_config_dir(), 'autosave')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def atomic_write(path, text, newline=''):
+    """Write ``text`` to a temp file, fsync it and rename it over ``path``.
+
+    A symlink is followed and its target replaced, and the permissions of
+    an existing file are kept.
+    """
+    path = os.path.realpath(path)
+    tmp_path = path + '.tmp'
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = None
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline=newline) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def apply_edits(text, records):
+    """Replay ``[position, removed, added]`` records over ``text``."""
+    # QTextDocument counts UTF-16 units and a final block separator
+    data = bytearray((text + '\n').encode('utf-16-le', 'surrogatepass'))
+    for position, removed, added in records:
+        data[position * 2:(position + removed) * 2] = added.encode('utf-16-le', 'surrogatepass')
+    return data.decode('utf-16-le', 'surrogatepass')[:-1]
+
+
+def _generations(path, kind):
+    found = []
+    for name in os.listdir(path):
+        match = GENERATION_RE.match(name)
+        if match and match.group(1) == kind:
+            found.append(int(match.group(2)))
+    return sorted(found)
+
+
+def _read_journal(path):
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Torn last line from a crash mid-write
+                break
+    return records
+
+
+def find_sessions(root=None):
+    root = root or default_autosave_dir()
+    return [os.path.join(root, name) for name in sorted(os.listdir(root))
+            if os.path.isfile(os.path.join(root, name, SESSION_FILE))]
+
+
+def read_session(path):
+    """Return ``(source_file, text)`` rebuilt from a session directory, or None if nothing usable is left."""
+    try:
+        with open(os.path.join(path, SESSION_FILE), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        bases = _generations(path, 'base')
+        if not bases:
+            return None
+        generation = bases[-1]
+        with open(os.path.join(path, f'base.{generation}.md'), 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        for journal in _generations(path, 'journal'):
+            if journal >= generation:
+                text = apply_edits(text, _read_journal(os.path.join(path, f'journal.{journal}.log')))
+    except (OSError, ValueError, UnicodeError):
+        return None
+    return info.get('file'), text
+
+
+def remove_session(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+class AutosaveSession:
+    """Journal for one open document.
+
+    ``record`` and ``begin_compaction`` only buffer; ``flush`` and
+    ``finish_compaction`` do the file I/O and may run on a worker thread.
+    """
+
+    def __init__(self, path, source_file=None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.generation = 0
+        self._pending = []
+        # Records of the journal generation being closed, not written yet
+        self._sealed = []
+        self._pending_lock = threading.Lock()
+        # Held while writing so batches land in the journal in order
+        self._write_lock = threading.Lock()
+        self._journal = open(os.path.join(path, 'journal.0.log'), 'a', encoding='utf-8')
+        self._journal_generation = 0
+        self._discarded = False
+        self.journal_bytes = 0
+        self.set_source_file(source_file)
+
+    @classmethod
+    def create(cls, root=None, source_file=None):
+        return cls(os.path.join(root or default_autosave_dir(), uuid.uuid4().hex), source_file)
+
+    def set_source_file(self, source_file):
+        self.source_file = source_file
+        atomic_write(os.path.join(self.path, SESSION_FILE), json.dumps({'file': source_file}))
+
+    def record(self, position, removed, added):
+        # ASCII escapes keep a lone surrogate from an edit inside an emoji writable
+        line = json.dumps([position, removed, added]) + '\n'
+        with self._pending_lock:
+            self._pending.append(line)
+
+    def _write_pending(self):
+        with self._pending_lock:
+            sealed, self._sealed = self._sealed, []
+            lines, self._pending = self._pending, []
+            generation = self.generation
+        if generation != self._journal_generation:
+            # Compaction started, finish the old journal before opening the new one
+            if sealed:
+                self._journal.write(''.join(sealed))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._journal = open(os.path.join(self.path, f'journal.{generation}.log'), 'a', encoding='utf-8')
+            self._journal_generation = generation
+        if lines:
+            chunk = ''.join(lines)
+            self._journal.write(chunk)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self.journal_bytes += len(chunk)
+
+    def flush(self):
+        with self._write_lock:
+            if self._journal is not None:
+                self._write_pending()
+
+    def begin_compaction(self):
+        """Start a new journal generation and return its number; no file I/O.
+
+        Call with the document text unchanged since the last ``record``;
+        pass that text and the number to ``finish_compaction``, and do not
+        begin another compaction before it has run. Records from now on
+        belong to the new generation.
+        """
+        with self._pending_lock:
+            self._sealed.extend(self._pending)
+            self._pending = []
+            self.generation += 1
+            self.journal_bytes = 0
+            return self.generation
+
+    def finish_compaction(self, generation, text):
+        """Close the previous journal, snapshot ``text`` as ``base.<generation>.md``, then drop the older generations.
+
+        Does nothing once the session is discarded.
+        """
+        with self._write_lock:
+            if self._discarded:
+                return
+            if self._journal is not None:
+                self._write_pending()
+            atomic_write(os.path.join(self.path, f'base.{generation}.md'), text)
+            for kind, extension in (('base', 'md'), ('journal', 'log')):
+                for older in _generations(self.path, kind):
+                    if older < generation:
+                        try:
+                            os.remove(os.path.join(self.path, f'{kind}.{older}.{extension}'))
+                        except OSError:
+                            pass
+
+    def close(self):
+        with self._write_lock:
+            if self._journal is not None:
+                self._write_pending()
+                self._journal.close()
+                self._journal = None
+
+    def discard(self):
+        # Waits for a snapshot being written and turns away any still queued,
+        # which would recreate files in the removed directory
+        with self._write_lock:
+            self._discarded = True
+        self.close()
+        remove_session(self.path)
@@ -0,0 +1,197 @@
+"""Azure Boards REST client used by the Publish actions.
+
+Plain ``requests`` code with no Qt dependency; the editor runs these calls on
+a worker thread. ``org_url`` may point at any HTTP server, which is how the
+client is exercised against a local stub.
+"""
+import base64
+import email.utils
+import json
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from latency import TRACER
+
+API_VERSION = "6.0"
+# Azure DevOps rejects work item batches larger than this
+BATCH_LIMIT = 200
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A throttled request was turned away unprocessed, so even a POST can be sent again
+THROTTLE_STATUSES = {429}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class AzureBoardsError(Exception):
+    def __init__(self, message, status=None, created=None):
+        super().__init__(message)
+        self.status = status
+        # Work items created before a batch failed
+        self.created = created or []
+
+
+def _request_sent(error):
+    """False when ``error`` is a failure to connect, raised before any of the request went out."""
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+    reason = error.args[0] if error.args else None
+    # requests wraps urllib3's MaxRetryError, which holds the underlying error
+    reason = getattr(reason, 'reason', reason)
+    return not isinstance(reason, NewConnectionError)
+
+
+class AzureBoardsClient:
+    def __init__(self, org_url, project, pat, timeout=30, max_retries=4, backoff=1.0, max_backoff=60.0,
+                 pool_size=4, session=None, sleep=time.sleep):
+        self.org_url = org_url.rstrip('/')
+        self.project = project
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        if session is None:
+            session = requests.Session()
+            # Keep connections to dev.azure.com alive between calls
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        session.headers['Authorization'] = 'Basic ' + base64.b64encode(f':{pat}'.encode()).decode()
+        self.session = session
+
+    def close(self):
+        self.session.close()
+
+    def _retry_delay(self, resp, attempt):
+        delay = self.backoff * (2 ** attempt)
+        retry_after = resp.headers.get('Retry-After') if resp is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    when = email.utils.parsedate_to_datetime(retry_after)
+                    delay = when.timestamp() - time.time()
+                except (TypeError, ValueError):
+                    pass
+        return min(max(delay, 0.0), self.max_backoff)
+
+    def request(self, method, url, idempotent=None, **kwargs):
+        """Send a request, retrying throttled (429) and 5xx responses with backoff.
+
+        Requests that are not ``idempotent`` (by default any method outside
+        IDEMPOTENT_METHODS, i.e. POST and PATCH) may already have taken effect
+        when a 5xx, a timeout or a dropped connection comes back, so they are
+        only retried on 429 and when the connection could not be opened.
+        ``Retry-After`` is honoured when the server sends it. Returns the
+        decoded JSON body or raises AzureBoardsError.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else THROTTLE_STATUSES
+        kwargs.setdefault('timeout', self.timeout)
+        with TRACER.span('azure_request', method=method, url=url):
+            attempt = 0
+            while True:
+                try:
+                    resp = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt >= self.max_retries or (not idempotent and _request_sent(e)):
+                        raise AzureBoardsError(f"{method} {url} failed: {e}") from e
+                    self.sleep(self._retry_delay(None, attempt))
+                    attempt += 1
+                    continue
+                if resp.status_code in retry_statuses and attempt < self.max_retries:
+                    self.sleep(self._retry_delay(resp, attempt))
+                    attempt += 1
+                    continue
+                if resp.status_code not in (200, 201):
+                    raise AzureBoardsError(f"Status: {resp.status_code}\n{resp.text}", resp.status_code)
+                try:
+                    return resp.json()
+                except ValueError as e:
+                    raise AzureBoardsError(f"Invalid response from {url}: {e}", resp.status_code) from e
+
+    def _task_patch(self, title, description):
+        return [
+            {"op": "add", "path": "/fields/System.Title", "from": None, "value": title},
+            {"op": "add", "path": "/fields/System.Description", "from": None, "value": description}
+        ]
+
+    def create_task(self, title, description):
+        url = f"{self.org_url}/{self.project}/_apis/wit/workitems/$Task?api-version={API_VERSION}"
+        return self.request('POST', url, json=self._task_patch(title, description),
+                            headers={'Content-Type': 'application/json-patch+json'})
+
+    def get_work_item(self, work_item_id):
+        url = f"{self.org_url}/{self.project}/_apis/wit/workitems/{work_item_id}?api-version={API_VERSION}"
+        return self.request('GET', url)
+
+    def get_work_items(self, ids, fields=None):
+        """Fetch many work items with the workitemsbatch API, BATCH_LIMIT ids per request.
+
+        Items that no longer exist are left out of the result.
+        """
+        url = f"{self.org_url}/{self.project}/_apis/wit/workitemsbatch?api-version={API_VERSION}"
+        ids = list(ids)
+        items = []
+        for start in range(0, len(ids), BATCH_LIMIT):
+            body = {"ids": ids[start:start + BATCH_LIMIT], "errorPolicy": "omit"}
+            if fields:
+                body["fields"] = list(fields)
+            # A read, safe to repeat although it is a POST
+            result = self.request('POST', url, idempotent=True, json=body)
+            items.extend(item for item in result.get('value', []) if item)
+        return items
+
+    def create_tasks(self, tasks):
+        """Create one Task per ``(title, description)`` through the $batch endpoint.
+
+        Sends at most BATCH_LIMIT items per round trip and returns the created
+        work items in input order. A batch is not all or nothing, so when an
+        item or a round trip fails the AzureBoardsError raised lists the IDs
+        created so far and carries those work items in ``created``.
+        """
+        url = f"{self.org_url}/_apis/wit/$batch?api-version={API_VERSION}"
+        uri = f"/{self.project}/_apis/wit/workitems/$Task?api-version={API_VERSION}"
+        created = []
+        for start in range(0, len(tasks), BATCH_LIMIT):
+            body = [
+                {
+                    "method": "PATCH",
+                    "uri": uri,
+                    "headers": {"Content-Type": "application/json-patch+json"},
+                    "body": self._task_patch(title, description),
+                }
+                for title, description in tasks[start:start + BATCH_LIMIT]
+            ]
+            try:
+                result = self.request('POST', url, json=body)
+            except AzureBoardsError as e:
+                raise self._partial_error(created, len(tasks), str(e), e.status) from e
+            failures = []
+            for offset, item in enumerate(result.get('value', [])):
+                payload = item.get('body')
+                if isinstance(payload, str):
+                    try:
+                        payload = json.loads(payload)
+                    except ValueError:
+                        pass
+                if item.get('code') not in (200, 201):
+                    failures.append((tasks[start + offset][0], item.get('code'), payload))
+                else:
+                    created.append(payload)
+            if failures:
+                title, status, payload = failures[0]
+                raise self._partial_error(
+                    created, len(tasks), f"{len(failures)} failed, first '{title}'.\nStatus: {status}\n{payload}", status)
+        return created
+
+    def _partial_error(self, created, total, detail, status):
+        ids = ', '.join(str(item.get('id', '?')) if isinstance(item, dict) else '?' for item in created)
+        message = f"Created {len(created)} of {total} tasks"
+        if ids:
+            message += f" (IDs: {ids})"
+        return AzureBoardsError(f"{message}, then {detail}", status, created)
@@ -0,0 +1,147 @@
+"""Headless batch conversion: ``python main.py render <dir> --jobs N``.
+
+Converts every ``.md`` file under a directory to HTML with a process pool,
+into ``<dir>-html`` next to it unless ``--out`` names another folder outside
+the sources.
+A manifest of source hashes is kept in the output directory so unchanged
+files are skipped on the next run. main.py runs this module as ``__main__``,
+so workers started with spawn (Windows, macOS) import only this module and
+mdrender, never Qt.
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from mdrender import RENDER_VERSION, render_html
+
+MANIFEST_NAME = ".mdrender-manifest.json"
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+</head>
+<body>
+{body}
+</body>
+</html>
+'''
+
+
+def find_markdown_files(root, folders=None):
+    """Relative paths of the ``.md`` files under ``root``; every folder walked is added to ``folders`` if given."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Skip hidden directories such as .git
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        if folders is not None:
+            folders.append(dirpath)
+        for name in sorted(filenames):
+            if name.lower().endswith('.md'):
+                yield os.path.relpath(os.path.join(dirpath, name), root)
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != RENDER_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def save_manifest(path, files):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': RENDER_VERSION, 'files': files}, f, indent=0, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def convert_file(job):
+    """Worker: render one file unless its hash matches the previous run.
+
+    Returns ``(rel_path, status, source_hash, bytes_read)`` where status is
+    ``converted``, ``skipped`` or an error message.
+    """
+    rel_path, src_path, dst_path, old_hash = job
+    try:
+        with open(src_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest == old_hash and os.path.exists(dst_path):
+            return rel_path, 'skipped', digest, len(data)
+        md_text = data.decode('utf-8')
+        page = PAGE_TEMPLATE.format(
+            title=html.escape(os.path.splitext(os.path.basename(rel_path))[0]),
+            body=render_html(md_text),
+        )
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        with open(dst_path, 'w', encoding='utf-8') as f:
+            f.write(page)
+        return rel_path, 'converted', digest, len(data)
+    except Exception as e:
+        return rel_path, f'error: {e}', None, 0
+
+
+def render_directory(src_dir, out_dir, jobs=None, force=False, log=print):
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = {} if force else load_manifest(manifest_path)
+    work = []
+    for rel_path in find_markdown_files(src_dir):
+        dst_path = os.path.join(out_dir, os.path.splitext(rel_path)[0] + '.html')
+        work.append((rel_path, os.path.join(src_dir, rel_path), dst_path, previous.get(rel_path)))
+
+    counts = {'converted': 0, 'skipped': 0, 'failed': 0}
+    total_bytes = 0
+    files = {}
+    start = time.perf_counter()
+    jobs = jobs or os.cpu_count() or 1
+    # Small files dominate docs trees, hand them out in chunks to cut IPC overhead
+    chunksize = max(1, min(64, len(work) // (jobs * 4) or 1))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for rel_path, status, digest, nbytes in pool.map(convert_file, work, chunksize=chunksize):
+            if digest is None:
+                counts['failed'] += 1
+                log(f"{rel_path}: {status}")
+                continue
+            counts[status] += 1
+            files[rel_path] = digest
+            total_bytes += nbytes
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(out_dir, exist_ok=True)
+    save_manifest(manifest_path, files)
+    rate = len(work) / elapsed if elapsed else 0.0
+    mb_rate = total_bytes / (1024 * 1024) / elapsed if elapsed else 0.0
+    log(f"{len(work)} files in {elapsed:.2f}s with {jobs} jobs: "
+        f"{counts['converted']} converted, {counts['skipped']} unchanged, {counts['failed']} failed "
+        f"({rate:.1f} files/s, {mb_rate:.2f} MB/s)")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py render", description="Convert a folder of Markdown files to HTML.")
+    parser.add_argument("directory", help="folder to scan for .md files")
+    parser.add_argument("--out", help="output folder outside the sources, created if missing (default: <directory>-html)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render files even if unchanged")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+    src_dir = os.path.abspath(args.directory)
+    out_dir = os.path.abspath(args.out) if args.out else src_dir + '-html'
+    if os.path.commonpath([src_dir, out_dir]) == src_dir:
+        parser.error(f"the output folder must be outside {args.directory}")
+    counts = render_directory(src_dir, out_dir, args.jobs, args.force)
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
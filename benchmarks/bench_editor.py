@@ -0,0 +1,384 @@
+"""Headless benchmarks for the editor's hot paths.
+
+    python benchmarks/bench_editor.py [--sizes 1K,10K,100K,1M,20M] [--repeat 3]
+        [--only update_preview_keystroke,markdown2] [--output run.json]
+        [--baseline previous.json --tolerance 1.25] [--trace trace.json]
+
+Runs under QT_QPA_PLATFORM=offscreen (set automatically) with no GPU or
+network. Every benchmark runs against synthetic documents from corpus.py;
+benchmarks that do not scale to the largest sizes (markdown2 on a whole
+document is superlinear) have a default size cap, lifted with --no-limits.
+Results are written as JSON; with --baseline the run exits with status 1 when
+a median regressed by more than --tolerance. --trace turns on the editor's
+latency instrumentation and writes its spans as a Chrome trace.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+RESULTS_VERSION = 1
+SIZE_UNITS = {'K': 1024, 'M': 1024 * 1024}
+# Largest document each benchmark runs on unless --no-limits is given
+SIZE_LIMITS = {
+    'markdown2': 256 * 1024,
+    # Replaces the whole selection in a live QTextEdit, minutes at 20M
+    'insert_normal_text': 1024 * 1024,
+}
+
+
+def parse_size(text):
+    text = text.strip().upper().rstrip('B')
+    if text[-1:] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    return int(text)
+
+
+def size_label(size):
+    for unit, factor in (('M', SIZE_UNITS['M']), ('K', SIZE_UNITS['K'])):
+        if size >= factor and size % factor == 0:
+            return f'{size // factor}{unit}'
+    return str(size)
+
+
+class Bench:
+    """Shared state for one run: the Qt application, one editor window and a scratch folder."""
+
+    def __init__(self, scratch):
+        from PyQt5.QtGui import QColor, QImage
+        from PyQt5.QtWidgets import QApplication
+        self.app = QApplication.instance() or QApplication([])
+        import main
+
+        class BenchEditor(main.MarkdownEditor):
+            def recover_autosave(self):
+                # Leftover sessions are the user's, never prompt from a benchmark
+                pass
+
+        self.scratch = scratch
+        self.image_path = os.path.join(scratch, 'image.png')
+        image = QImage(1600, 1200, QImage.Format_RGB32)
+        image.fill(QColor('steelblue'))
+        image.save(self.image_path)
+        self.window = BenchEditor()
+        # Measure the render itself, not the typing debounce
+        self.window.preview_scheduler.debounce_ms = 0
+        self._rendered = False
+        self.window.preview_scheduler.rendered.connect(self._on_rendered)
+        self.documents = {}
+
+    def _on_rendered(self, html):
+        self._rendered = True
+
+    def document(self, size):
+        from corpus import make_document
+        if size not in self.documents:
+            self.documents = {size: make_document(size, image_path=self.image_path.replace(os.sep, '/'))}
+        return self.documents[size]
+
+    def pump_until(self, done, timeout=600):
+        deadline = time.perf_counter() + timeout
+        while not done():
+            if time.perf_counter() > deadline:
+                raise TimeoutError('benchmark step did not finish')
+            self.app.processEvents()
+            time.sleep(0.0005)
+
+    def document_file(self, size):
+        path = os.path.join(self.scratch, f'document-{size}.md')
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(self.document(size))
+        return path
+
+    def load(self, size):
+        """Open the ``size`` document the way File > Open does and wait for its preview, untimed."""
+        self.reset()
+        self._rendered = False
+        self.window.load_file(self.document_file(size))
+        self.pump_until(lambda: not self.window._loading_file and self._rendered)
+        self.app.processEvents()
+
+    def reset(self):
+        from PyQt5.QtCore import QEvent
+        # Start every measurement from a single empty tab
+        window = self.window
+        window.new_file()
+        for tab in window.tabs[:-1]:
+            window.discard_tab(tab)
+        # processEvents outside exec() never deletes, free the closed documents now
+        self.app.sendPostedEvents(None, QEvent.DeferredDelete)
+        self.app.processEvents()
+
+    def wait_rendered(self):
+        self.pump_until(lambda: self._rendered)
+
+
+def bench_markdown2(bench, size):
+    import markdown2
+    text = bench.document(size)
+    return lambda: markdown2.markdown(text)
+
+
+def bench_postprocess(bench, size):
+    from mdrender import postprocess_html, render_fragment
+    from corpus import make_document
+    # Tile the HTML of a small document, rendering a large one whole would dominate the run
+    sample = render_fragment(make_document(16 * 1024, image_path='image.png'))
+    html = sample * max(1, size // len(sample) + 1)
+    return lambda: postprocess_html(html)
+
+
+def bench_update_preview_cold(bench, size):
+    """Full preview of a freshly loaded document, block cache empty."""
+    bench.load(size)
+
+    def run():
+        bench.window.block_renderer.clear()
+        bench._rendered = False
+        bench.window.update_preview()
+        bench.wait_rendered()
+    return run
+
+
+def bench_update_preview_keystroke(bench, size):
+    """A character typed in the middle of the viewport and deleted again, each through textChanged to the preview."""
+    bench.load(size)
+    editor = bench.window.editor
+    cursor = editor.cursorForPosition(editor.viewport().rect().center())
+    editor.setTextCursor(cursor)
+
+    def run():
+        bench._rendered = False
+        cursor = editor.textCursor()
+        cursor.insertText('x')
+        bench.wait_rendered()
+        cursor.deletePreviousChar()
+        bench._rendered = False
+        bench.wait_rendered()
+    return run
+
+
+def bench_switch_tab(bench, size):
+    """Back to the ``size`` document from another tab, until its preview is shown again."""
+    bench.load(size)
+    window = bench.window
+    window.new_file()
+    bench.app.processEvents()
+
+    def run():
+        bench._rendered = False
+        window.tab_bar.setCurrentIndex(0)
+        bench.wait_rendered()
+        bench._rendered = False
+        window.tab_bar.setCurrentIndex(1)
+        bench.wait_rendered()
+    return run
+
+
+def bench_highlight_document(bench, size):
+    """A document made from ``size`` characters and syntax highlighted, the way opening a file does it."""
+    text = bench.document(size)
+    return lambda: bench.window.create_document(text)
+
+
+def bench_outline_index(bench, size):
+    """The heading index built from scratch, as when the outline is first shown."""
+    from outline import HeadingIndex
+    text = bench.document(size)
+    return lambda: HeadingIndex(text).headings()
+
+
+def bench_outline_filter(bench, size):
+    """A fuzzy outline query typed one character at a time over every heading of the document."""
+    from outline import HeadingIndex
+    index = HeadingIndex(bench.document(size))
+
+    def run():
+        # A new title list each run, as after an edit that changed the headings
+        index._titles = None
+        for end in range(1, 5):
+            index.filter('tbla'[:end])
+    return run
+
+
+def bench_insert_normal_text(bench, size):
+    """Normal Text applied to a selection of the whole document."""
+    from PyQt5.QtGui import QTextCursor
+    editor = bench.window.editor
+
+    def setup():
+        bench.load(size)
+        cursor = editor.textCursor()
+        cursor.select(QTextCursor.Document)
+        editor.setTextCursor(cursor)
+
+    def run():
+        bench.window.insert_normal_text()
+    run.setup = setup
+    return run
+
+
+def bench_table_serialization(bench, size):
+    """Grid editor output: a TableData of about ``size`` characters written as GFM."""
+    from mdtable import TableData, format_table
+    rows = max(2, size // 60)
+    table = TableData.blank(rows, 5)
+    return lambda: format_table(table)
+
+
+def bench_open_file(bench, size):
+    """load_file, including the progressive loader for large files."""
+    path = bench.document_file(size)
+    window = bench.window
+
+    def run():
+        window.load_file(path)
+        bench.pump_until(lambda: not window._loading_file)
+    run.setup = bench.reset
+    return run
+
+
+def bench_save_file(bench, size):
+    path = os.path.join(bench.scratch, f'save-{size}.md')
+    bench.load(size)
+    return lambda: bench.window.write_file(path)
+
+
+BENCHMARKS = {
+    'markdown2': bench_markdown2,
+    'postprocess': bench_postprocess,
+    'update_preview_cold': bench_update_preview_cold,
+    'update_preview_keystroke': bench_update_preview_keystroke,
+    'switch_tab': bench_switch_tab,
+    'highlight_document': bench_highlight_document,
+    'outline_index': bench_outline_index,
+    'outline_filter': bench_outline_filter,
+    'insert_normal_text': bench_insert_normal_text,
+    'table_serialization': bench_table_serialization,
+    'open_file': bench_open_file,
+    'save_file': bench_save_file,
+}
+
+
+def measure(run, repeat):
+    times = []
+    for _ in range(repeat):
+        setup = getattr(run, 'setup', None)
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_benchmarks(names, sizes, repeat, limits=True, log=print):
+    from PyQt5.QtCore import QThreadPool
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='mdbench-') as scratch:
+        # Keep autosave sessions and indexes of the benchmark away from the user's
+        os.environ['XDG_CONFIG_HOME'] = os.environ['APPDATA'] = scratch
+        bench = Bench(scratch)
+        for size in sizes:
+            for name in names:
+                key = f'{name}/{size_label(size)}'
+                if limits and size > SIZE_LIMITS.get(name, size):
+                    results[key] = {'skipped': f'larger than {size_label(SIZE_LIMITS[name])}, see --no-limits'}
+                    continue
+                run = BENCHMARKS[name](bench, size)
+                times = measure(run, repeat)
+                results[key] = {
+                    'size': size,
+                    'runs': times,
+                    'best': min(times),
+                    'median': statistics.median(times),
+                }
+                log(f'{key:<36} best {min(times) * 1000:>10.2f}ms  median {statistics.median(times) * 1000:>10.2f}ms')
+        # Let autosave snapshots still being written finish before the scratch folder goes
+        QThreadPool.globalInstance().waitForDone()
+        bench.window.stop_autosave(discard=True)
+        bench.window.close()
+    return results
+
+
+def environment():
+    from PyQt5.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+    import markdown2
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'qt': QT_VERSION_STR,
+        'pyqt': PYQT_VERSION_STR,
+        'markdown2': markdown2.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Return ``(key, old, new)`` for every median that got slower than allowed."""
+    regressions = []
+    for key, old in baseline.get('results', {}).items():
+        new = results.get(key)
+        if not new or 'median' not in new or 'median' not in old:
+            continue
+        if new['median'] > old['median'] * tolerance and new['median'] - old['median'] > min_delta:
+            regressions.append((key, old['median'], new['median']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1K,10K,100K,1M,20M', help='document sizes, e.g. 1K,10K,2.5M')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark and size')
+    parser.add_argument('--only', help='comma separated benchmarks to run: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--no-limits', action='store_true', help='run every benchmark at every size')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='allowed slowdown factor of a median')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='ignore slowdowns smaller than this')
+    parser.add_argument('--trace', help='record latency spans and write them to this Chrome trace file')
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    if args.trace:
+        from latency import TRACER
+        TRACER.enable()
+    results = run_benchmarks(names, sizes, args.repeat, limits=not args.no_limits)
+    if args.trace:
+        for stage, (count, p50, p95, worst) in sorted(TRACER.summary().items()):
+            print(f'{stage:<24} {count:>7}x  p50 {p50 * 1000:>9.2f}ms  p95 {p95 * 1000:>9.2f}ms  max {worst * 1000:>9.2f}ms')
+        TRACER.export_chrome_trace(args.trace)
+    report = {'version': RESULTS_VERSION, 'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms / 1000)
+        for key, old, new in regressions:
+            print(f'REGRESSION {key}: median {old * 1000:.2f}ms -> {new * 1000:.2f}ms ({new / old:.2f}x)')
+        if regressions:
+            return 1
+        print(f'No regressions against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
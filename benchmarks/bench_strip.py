@@ -0,0 +1,106 @@
+"""Benchmark mdrender.strip_markdown against the regex chain it replaced.
+
+    python benchmarks/bench_strip.py [--sizes 10000,100000,1000000] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mdrender import strip_markdown  # noqa: E402
+
+SAMPLE = """## Section {n}
+
+Some **bold** and _italic_ text, a `code_span` and a [link](http://example.com/a_b_{n}).
+> A quote with ==highlight== and ~~strike~~.
+
+- [ ] Task {n}
+- Item with snake_case_name
+1. First
+
+| Header 1 | Header 2 |
+|----------|----------|
+| Cell {n} | Cell 2 |
+
+```python
+value_{n} = compute(a * b)
+```
+<!-- Comment -->
+"""
+
+
+def strip_markdown_regex(text):
+    """The original insert_normal_text implementation, one re.sub per rule."""
+    # Remove code blocks (```...```)
+    text = re.sub(r'```[\s\S]*?```', '', text)
+    # Remove inline code
+    text = re.sub(r'`([^`]+)`', r'\1', text)
+    # Remove bold, italic, strikethrough, highlight (nested and simple)
+    text = re.sub(r'(\*\*|__)(.*?)\1', r'\2', text)  # bold
+    text = re.sub(r'(\*|_)(.*?)\1', r'\2', text)     # italic
+    text = re.sub(r'~~(.*?)~~', r'\1', text)           # strikethrough
+    text = re.sub(r'==(.*?)==', r'\1', text)           # highlight
+    # Remove headings
+    text = re.sub(r'^\s*#{1,6}\s*', '', text, flags=re.MULTILINE)
+    # Remove blockquotes
+    text = re.sub(r'^\s*>\s*', '', text, flags=re.MULTILINE)
+    # Remove unordered and ordered lists
+    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
+    # Remove checklists
+    text = re.sub(r'- \[[ xX]\] ', '', text)
+    # Remove links/images, keep text
+    text = re.sub(r'!\[([^\]]*)\]\([^\)]*\)', r'\1', text)  # images
+    text = re.sub(r'\[([^\]]+)\]\([^\)]*\)', r'\1', text)   # links
+    # Remove HTML tags
+    text = re.sub(r'<[^>]+>', '', text)
+    # Remove comments
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.DOTALL)
+    # Remove table pipes and headers
+    text = re.sub(r'\|', '', text)
+    text = re.sub(r'^\s*-{3,}\s*$', '', text, flags=re.MULTILINE)  # table header lines
+    # Remove extra whitespace and collapse newlines
+    text = re.sub(r'\s+\n', '\n', text)
+    text = re.sub(r'\n+', '\n', text)
+    return text.strip()
+
+
+def make_document(size):
+    parts = []
+    total = 0
+    n = 0
+    while total < size:
+        chunk = SAMPLE.format(n=n)
+        parts.append(chunk)
+        total += len(chunk)
+        n += 1
+    return ''.join(parts)[:size]
+
+
+def best_time(func, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='comma separated document sizes in characters')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+    print(f"{'size':>10} {'regex chain':>12} {'single pass':>12} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        text = make_document(size)
+        old = best_time(strip_markdown_regex, text, args.repeat)
+        new = best_time(strip_markdown, text, args.repeat)
+        print(f"{size:>10} {old * 1000:>10.2f}ms {new * 1000:>10.2f}ms {old / new:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Synthetic Markdown documents for the benchmarks.
+
+Documents mix the block types the editor sees in practice: headings,
+paragraphs with emphasis, links, inline code, ==highlight== and ~~strike~~,
+lists and task lists, tables, fenced code, quotes, comments and images. The
+same seed and size always give the same text.
+"""
+import random
+
+WORDS = ('the preview editor table render section azure task markdown cache block image document '
+         'update heading value list item quick brown fox jumps over lazy dog performance latency').split()
+
+
+def _words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def _inline(rng):
+    text = _words(rng, rng.randint(8, 30)).split()
+    for i in rng.sample(range(len(text)), rng.randint(1, 4)):
+        style = rng.randrange(7)
+        if style == 0:
+            text[i] = f'**{text[i]}**'
+        elif style == 1:
+            text[i] = f'_{text[i]}_'
+        elif style == 2:
+            text[i] = f'`{text[i]}_{rng.randint(0, 99)}`'
+        elif style == 3:
+            text[i] = f'[{text[i]}](https://example.com/{text[i]}_{rng.randint(0, 999)})'
+        elif style == 4:
+            text[i] = f'=={text[i]}=='
+        elif style == 5:
+            text[i] = f'~~{text[i]}~~'
+        else:
+            text[i] = f'***{text[i]}***'
+    return ' '.join(text)
+
+
+def _table(rng):
+    cols = rng.randint(3, 6)
+    rows = rng.randint(3, 15)
+    lines = ['| ' + ' | '.join(f'Header {c + 1}' for c in range(cols)) + ' |',
+             '|' + '|'.join(rng.choice(['---', ':--', '--:', ':-:']) for _ in range(cols)) + '|']
+    for _ in range(rows):
+        lines.append('| ' + ' | '.join(_words(rng, rng.randint(1, 3)) for _ in range(cols)) + ' |')
+    return '\n'.join(lines)
+
+
+def _code(rng):
+    lang = rng.choice(['python', 'js', 'sh', ''])
+    body = '\n'.join(f'{rng.choice(WORDS)}_{i} = compute({rng.choice(WORDS)}, {i} * 2)' for i in range(rng.randint(3, 20)))
+    return f'```{lang}\n{body}\n```'
+
+
+def _block(rng, image_path):
+    kind = rng.random()
+    if kind < 0.12:
+        return '#' * rng.randint(1, 3) + ' ' + _words(rng, rng.randint(2, 6)).title()
+    if kind < 0.50:
+        return _inline(rng)
+    if kind < 0.60:
+        return '\n'.join(f'- {_inline(rng)}' for _ in range(rng.randint(2, 6)))
+    if kind < 0.65:
+        return '\n'.join(f'- [{rng.choice(" x")}] {_words(rng, 4)}' for _ in range(rng.randint(2, 5)))
+    if kind < 0.75:
+        return _table(rng)
+    if kind < 0.85:
+        return _code(rng)
+    if kind < 0.90:
+        return '> ' + _inline(rng)
+    if kind < 0.93:
+        return f'<!-- {_words(rng, 6)} -->'
+    if kind < 0.965:
+        return f'![{_words(rng, 2)}]({image_path})'
+    return f'<img src="{image_path}" alt="image" width="{rng.choice([120, 240, 480])}" />'
+
+
+def make_document(size, seed=0, image_path='image.png'):
+    """Return about ``size`` characters of Markdown (never cut inside a block)."""
+    rng = random.Random(seed)
+    blocks = []
+    total = 0
+    while total < size:
+        block = _block(rng, image_path)
+        blocks.append(block)
+        total += len(block) + 2
+    return '\n\n'.join(blocks) + '\n'
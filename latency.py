@@ -0,0 +1,142 @@
+"""Opt-in latency instrumentation for the editor's hot stages.
+
+Code wraps a stage in ``with TRACER.span('name'):``. While the tracer is
+enabled every finished span feeds a rolling histogram for its stage and a
+bounded buffer of Chrome trace events (load the export in chrome://tracing
+or Perfetto). While it is disabled ``span`` hands back one shared no-op
+context manager, so instrumented code pays an attribute check and nothing
+else. Spans may finish on any thread. No Qt dependency.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Durations kept per stage for percentiles
+HISTOGRAM_SAMPLES = 512
+# Trace events kept for export, oldest dropped first
+TRACE_EVENTS = 200000
+
+
+class Histogram:
+    """The most recent ``size`` durations of one stage, in seconds."""
+
+    def __init__(self, size=HISTOGRAM_SAMPLES):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentiles(self, *ps):
+        """The ``ps`` percentiles of the retained samples, None while there are none."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [None] * len(ps)
+        return [ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in ps]
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.events = deque(maxlen=TRACE_EVENTS)
+        self._origin = time.perf_counter()
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.events.clear()
+            self._origin = time.perf_counter()
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def record(self, name, start, end, args=None):
+        """Add a stage that ran from ``start`` to ``end`` (``time.perf_counter`` values)."""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(end - start)
+            self._threads.setdefault(thread.ident, thread.name)
+            self.events.append((name, start, end, thread.ident, args))
+
+    def percentiles(self, name, *ps):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                return [None] * len(ps)
+            return histogram.percentiles(*ps)
+
+    def summary(self):
+        """``{stage: (count, p50, p95, max)}`` in seconds, percentiles over the retained samples."""
+        with self._lock:
+            return {name: (h.count, *h.percentiles(50, 95, 100)) for name, h in self.histograms.items()}
+
+    def chrome_trace(self):
+        """The recorded spans in Chrome trace-event format."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+            origin = self._origin
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in threads.items()]
+        for name, start, end, tid, args in events:
+            event = {'name': name, 'cat': 'editor', 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': round((start - origin) * 1e6, 1), 'dur': round((end - start) * 1e6, 1)}
+            if args:
+                event['args'] = args
+            trace.append(event)
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+# Shared by the editor, the renderer and the Azure client
+TRACER = Tracer()
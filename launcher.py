@@ -0,0 +1,142 @@
+"""Single-instance launching and start-up profiling for the editor.
+
+The first editor listens on a per-user QLocalServer. A later ``main.py``
+launch connects to it, hands over its file arguments and exits before
+QtWidgets, markdown2 or any window is loaded; the running editor opens the
+files and comes to the front. Only QtCore and QtNetwork are imported here.
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from functools import partial
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+from paths import user_config_dir
+
+# Milliseconds a launch waits for a running editor to answer or take its files
+CONNECT_TIMEOUT_MS = 500
+SEND_TIMEOUT_MS = 2000
+# main.py's slowest imports, timed one by one under --startup-profile
+PROFILED_IMPORTS = ('PyQt5.QtGui', 'PyQt5.QtWidgets', 'autosave', 'latency', 'mdhighlight', 'mdrender', 'mdtable')
+
+
+def server_name():
+    # One editor per user and config folder, Unix sockets of every user share the temp folder
+    key = hashlib.sha1(user_config_dir().encode('utf-8')).hexdigest()[:12]
+    return f'MarkdownEditor-{key}'
+
+
+def parse_args(argv):
+    """Return ``(options, qt_args)``; arguments the launcher does not know are left to QApplication."""
+    parser = argparse.ArgumentParser(prog='main.py', description='Markdown editor with live preview.')
+    parser.add_argument('files', nargs='*', help='Markdown files to open')
+    parser.add_argument('--new-instance', action='store_true',
+                        help='start another editor instead of handing the files to the running one')
+    parser.add_argument('--startup-profile', action='store_true', help='print where start-up time went')
+    return parser.parse_known_args(argv)
+
+
+def send_to_running_instance(files):
+    """Hand ``files`` to a running editor. Returns False when there is none."""
+    socket = QLocalSocket()
+    socket.connectToServer(server_name())
+    if not socket.waitForConnected(CONNECT_TIMEOUT_MS):
+        return False
+    payload = json.dumps({'files': [os.path.abspath(f) for f in files]}) + '\n'
+    socket.write(payload.encode('utf-8'))
+    socket.flush()
+    # Disconnecting writes out whatever is still buffered first
+    socket.disconnectFromServer()
+    if socket.state() != QLocalSocket.UnconnectedState:
+        socket.waitForDisconnected(SEND_TIMEOUT_MS)
+    return True
+
+
+class InstanceServer(QObject):
+    """Accepts later launches and emits the files each one passed.
+
+    An empty list means the launch had no files; the window should still
+    come to the front.
+    """
+    files_received = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.UserAccessOption)
+        self._server.newConnection.connect(self._accept)
+        self._buffers = {}
+
+    def listen(self):
+        """Start serving; False when another editor already does."""
+        name = server_name()
+        # With socket options set Qt replaces an existing socket instead of failing, ask first
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(CONNECT_TIMEOUT_MS):
+            probe.disconnectFromServer()
+            return False
+        # Left behind by an editor that crashed
+        QLocalServer.removeServer(name)
+        return self._server.listen(name)
+
+    def close(self):
+        self._server.close()
+
+    def _accept(self):
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            self._buffers[socket] = bytearray()
+            socket.readyRead.connect(partial(self._read, socket))
+            socket.disconnected.connect(partial(self._finish, socket))
+
+    def _read(self, socket):
+        self._buffers[socket].extend(bytes(socket.readAll()))
+
+    def _finish(self, socket):
+        data = self._buffers.pop(socket, bytearray())
+        data.extend(bytes(socket.readAll()))
+        socket.deleteLater()
+        try:
+            files = json.loads(data.decode('utf-8'))['files']
+        except (ValueError, KeyError, TypeError):
+            # listen() probing from another launch, or garbage
+            return
+        self.files_received.emit([f for f in files if isinstance(f, str)])
+
+
+class StartupProfile:
+    """Wall-clock marks from the start of main.py, printed to stderr by ``report``."""
+
+    def __init__(self, enabled, started=None):
+        self.enabled = enabled
+        self.started = time.perf_counter() if started is None else started
+        self.marks = []
+
+    def mark(self, label):
+        if self.enabled:
+            self.marks.append((label, time.perf_counter()))
+
+    def import_modules(self):
+        # Importing them here first leaves main.py's own imports with nothing to do
+        if self.enabled:
+            for name in PROFILED_IMPORTS:
+                importlib.import_module(name)
+                self.mark(f'import {name}')
+
+    def report(self, file=None):
+        if not self.enabled:
+            return
+        file = file or sys.stderr
+        print('Start-up profile (ms, from the start of main.py):', file=file)
+        print(f'{"step":>9} {"total":>9}', file=file)
+        previous = self.started
+        for label, at in self.marks:
+            print(f'{(at - previous) * 1000:9.1f} {(at - self.started) * 1000:9.1f}  {label}', file=file)
+            previous = at
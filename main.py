@@ -1,13 +1,775 @@
+import bisect
+import csv
+import os
+import re
 import sys
+import time
+import zlib
+from collections import OrderedDict
+
+if __name__ == "__main__" and sys.argv[1:2] == ["render"]:
+    # Headless batch conversion, run as batch.py's own __main__: worker processes
+    # started with spawn re-import the main module, and this one would load Qt
+    import runpy
+    del sys.argv[1]
+    runpy.run_module('batch', run_name='__main__', alter_sys=True)
+
+if __name__ == "__main__":
+    # Before the heavy imports below, so a launch that only hands its files over exits at once
+    launch_started = time.perf_counter()
+    import launcher
+    launch_options, qt_args = launcher.parse_args(sys.argv[1:])
+    startup_profile = launcher.StartupProfile(launch_options.startup_profile, launch_started)
+    startup_profile.mark("import launcher (QtCore, QtNetwork)")
+    if not launch_options.new_instance and launcher.send_to_running_instance(launch_options.files):
+        startup_profile.mark("handed over to the running editor")
+        startup_profile.report()
+        sys.exit(0)
+    startup_profile.mark("checked for a running editor")
+    startup_profile.import_modules()
+
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QTextEdit, QAction, QFileDialog, QSplitter, QWidget, QVBoxLayout, QToolBar, QPushButton, QHBoxLayout
+    QApplication, QMainWindow, QTextEdit, QAction, QFileDialog, QSplitter, QWidget, QVBoxLayout, QToolBar, QPushButton, QHBoxLayout,
+    QDialog, QDockWidget, QHeaderView, QLabel, QLineEdit, QListView, QListWidget, QListWidgetItem, QTabBar, QTableView
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QIcon
-import markdown2
+from PyQt5.QtCore import Qt, QAbstractListModel, QAbstractTableModel, QFileSystemWatcher, QLockFile, QModelIndex, QObject, QPoint, QRunnable, QSize, QThread, QThreadPool, QTimer, QUrl, pyqtSignal
+from PyQt5.QtGui import QColor, QIcon, QImage, QImageReader, QTextCursor, QTextDocument
 from functools import partial
+from html import unescape
+from autosave import AutosaveSession, atomic_write, find_sessions, read_session, remove_session
+from latency import TRACER
+from mdhighlight import MarkdownHighlighter, ViewportHighlighter
+from mdrender import FENCE_RE, LINE_ANCHOR_RE, BlockRenderer, render_fragment, render_html, split_sections, strip_markdown
+from mdtable import DELIMITER_ROW_RE, TableData, is_table_line, parse_table, read_delimited, write_table
+from outline import HeadingIndex
+
+
+class _RenderSignals(QObject):
+    finished = pyqtSignal(int, str)
+
+
+class _RenderTask(QRunnable):
+    def __init__(self, generation, source, render, signals):
+        super().__init__()
+        self.generation = generation
+        self.source = source
+        self.render = render
+        self.signals = signals
+
+    def run(self):
+        try:
+            html = self.render(self.source)
+        except Exception as e:
+            html = f"<pre>Preview error: {e}</pre>"
+        self.signals.finished.emit(self.generation, html)
+
+
+class PreviewScheduler(QObject):
+    """Coalesces preview requests and renders them on a worker thread.
+
+    Every request bumps a generation counter; a render only reaches
+    ``rendered`` if no newer request arrived while it was running, or if the
+    source turns out to be the same when it finishes.
+    """
+    rendered = pyqtSignal(str)
+
+    def __init__(self, source, render=render_html, debounce_ms=150, async_render=True, parent=None):
+        super().__init__(parent)
+        # Called on the GUI thread, its result is passed to render on the worker
+        self.source = source
+        self.render = render
+        self.debounce_ms = debounce_ms
+        self.async_render = async_render
+        self._generation = 0
+        # The render running on the worker, if any
+        self._task = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._start_render)
+        # One worker is enough: a newer render always supersedes an older one
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._signals = _RenderSignals()
+        self._signals.finished.connect(self._on_finished)
+
+    def request(self, immediate=False):
+        self._generation += 1
+        if self.debounce_ms > 0 and not immediate:
+            self._timer.start(self.debounce_ms)
+        else:
+            self._timer.stop()
+            self._start_render()
+
+    def _start_render(self, source=None):
+        if self._task is not None:
+            # Picked up again in _on_finished with whatever text is current then
+            return
+        # toPlainText() must run on the GUI thread, only the conversion is offloaded
+        if source is None:
+            source = self.source()
+        if not self.async_render:
+            self.rendered.emit(self.render(source))
+            return
+        self._task = _RenderTask(self._generation, source, self.render, self._signals)
+        self._pool.start(self._task)
+
+    def _on_finished(self, generation, html):
+        task, self._task = self._task, None
+        if generation == self._generation:
+            self.rendered.emit(html)
+        elif not self._timer.isActive():
+            # Requested again while rendering and the debounce already elapsed
+            source = self.source()
+            if source == task.source:
+                # Nothing actually changed, the result is current
+                self.rendered.emit(html)
+            else:
+                self._start_render(source)
+
+
+class _CallSignals(QObject):
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class BackgroundCall(QRunnable):
+    """Runs ``func(*args)`` on a pool thread and reports back through signals."""
+
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.signals = _CallSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.succeeded.emit(result)
+
+
+class ImageCache:
+    """LRU of decoded preview images, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._images = OrderedDict()
+
+    def get(self, key):
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        if key in self._images:
+            self.size -= self._images.pop(key).sizeInBytes()
+        self._images[key] = image
+        self.size += image.sizeInBytes()
+        self.trim(self.max_bytes)
+
+    def trim(self, max_bytes):
+        """Drop the least recently used images until at most ``max_bytes`` are left, keeping at least one."""
+        while self.size > max_bytes and len(self._images) > 1:
+            _, old = self._images.popitem(last=False)
+            self.size -= old.sizeInBytes()
+
+    def clear(self):
+        self._images.clear()
+        self.size = 0
+
+
+def scaled_image_size(size, width, height, max_width):
+    """Size to decode an image of ``size`` at for the requested ``width``/``height``.
+
+    Without an explicit size the image is only ever shrunk, to ``max_width``.
+    """
+    w, h = size.width(), size.height()
+    if width and height:
+        return QSize(width, height)
+    if width:
+        return QSize(width, max(1, h * width // w))
+    if height:
+        return QSize(max(1, w * height // h), height)
+    if w > max_width:
+        return QSize(max_width, max(1, h * max_width // w))
+    return size
+
+
+class _ImageSignals(QObject):
+    decoded = pyqtSignal(object, object)
+
+
+class _ImageDecodeTask(QRunnable):
+    def __init__(self, key, signals):
+        super().__init__()
+        self.key = key
+        self.signals = signals
+
+    def run(self):
+        path, _, width, height, max_width = self.key
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid():
+            # Lets JPEG and friends decode straight to the smaller size
+            reader.setScaledSize(scaled_image_size(size, width, height, max_width))
+        self.signals.decoded.emit(self.key, reader.read())
+
+
+class PreviewPane(QTextEdit):
+    """Read-only preview that decodes local images off the GUI thread.
+
+    Images are downscaled to their ``width``/``height`` attributes, or to the
+    pane width, and kept in an ImageCache keyed by path, mtime and target
+    size. A placeholder is shown until the decoded image arrives.
+    """
+    IMG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+    ATTR_RE = re.compile(r'(src|width|height)\s*=\s*"([^"]*)"', re.IGNORECASE)
+
+    def __init__(self, cache_bytes=256 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.image_cache = ImageCache(cache_bytes)
+        self._html = ''
+        self._image_sizes = {}
+        self._waiting = set()
+        self._placeholders = {}
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(1, min(4, QThread.idealThreadCount())))
+        self._signals = _ImageSignals()
+        self._signals.decoded.connect(self._image_decoded)
+        # Images finishing close together share one relayout
+        self._relayout_timer = QTimer(self)
+        self._relayout_timer.setSingleShot(True)
+        self._relayout_timer.setInterval(50)
+        self._relayout_timer.timeout.connect(self._relayout)
+
+    def setHtml(self, html):
+        sizes = {}
+        for tag in self.IMG_RE.findall(html):
+            attrs = {k.lower(): v for k, v in self.ATTR_RE.findall(tag)}
+            if 'src' in attrs:
+                # Keyed the way loadResource receives it, Qt decodes entities and normalises the URL
+                src = QUrl(unescape(attrs['src'])).toString()
+                sizes[src] = (self._length(attrs.get('width')), self._length(attrs.get('height')))
+        self._image_sizes = sizes
+        self._html = html
+        super().setHtml(html)
+
+    def _length(self, value):
+        value = (value or '').strip().lower()
+        if value.endswith('%'):
+            try:
+                return int(self._max_image_width() * float(value[:-1]) / 100) or None
+            except ValueError:
+                return None
+        if value.endswith('px'):
+            value = value[:-2]
+        return int(value) if value.isdigit() and int(value) > 0 else None
+
+    def _max_image_width(self):
+        # Bucketed so dragging the splitter does not decode everything again
+        width = self.viewport().width() - 2 * int(self.document().documentMargin())
+        return max(100, width // 100 * 100)
+
+    def _local_path(self, url):
+        if url.isLocalFile():
+            return url.toLocalFile()
+        if url.scheme() in ('http', 'https', 'data', 'qrc'):
+            return None
+        # Windows drive letters parse as a URL scheme, plain paths as relative URLs
+        return os.path.abspath(url.toString())
+
+    def _placeholder(self, width, height):
+        size = (width or 160, height or 120)
+        image = self._placeholders.get(size)
+        if image is None:
+            image = QImage(size[0], size[1], QImage.Format_RGB32)
+            image.fill(QColor(230, 230, 230))
+            self._placeholders[size] = image
+        return image
+
+    def loadResource(self, resource_type, url):
+        if resource_type != QTextDocument.ImageResource:
+            return super().loadResource(resource_type, url)
+        path = self._local_path(url)
+        try:
+            mtime = os.stat(path).st_mtime if path else None
+        except OSError:
+            mtime = None
+        if mtime is None:
+            return super().loadResource(resource_type, url)
+        width, height = self._image_sizes.get(url.toString(), (None, None))
+        # The pane width only matters to images without a size of their own
+        max_width = None if width or height else self._max_image_width()
+        key = (path, mtime, width, height, max_width)
+        image = self.image_cache.get(key)
+        if image is not None:
+            return image
+        if key not in self._waiting:
+            self._waiting.add(key)
+            self._pool.start(_ImageDecodeTask(key, self._signals))
+        return self._placeholder(width, height)
+
+    def _image_decoded(self, key, image):
+        self._waiting.discard(key)
+        if image.isNull():
+            # Unreadable, keep showing the placeholder rather than retrying every render
+            image = self._placeholder(key[2], key[3])
+        self.image_cache.put(key, image)
+        self._relayout_timer.start()
+
+    def _relayout(self):
+        # Setting the same HTML again picks the decoded images up from the cache
+        scrollbar = self.verticalScrollBar()
+        pos = scrollbar.value()
+        super().setHtml(self._html)
+        scrollbar.setValue(pos)
+
+
+class LargeFileLoader(QObject):
+    """Fills a detached QTextDocument from a file, one chunk per event-loop turn.
+
+    The file is read incrementally in text mode, so only one chunk is held
+    in memory besides the document itself. The document has no view attached
+    while it fills, which keeps every append cheap; the caller installs it
+    with ``setDocument`` once ``finished(True)`` is emitted.
+    """
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(bool)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, chunk_chars=64 * 1024, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.chunk_chars = chunk_chars
+        self.document = QTextDocument()
+        self.document.setUndoRedoEnabled(False)
+        self._file = None
+        self._size = 0
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._step)
+
+    def start(self):
+        try:
+            self._file = open(self.path, 'r', encoding='utf-8')
+            self._size = os.fstat(self._file.fileno()).st_size or 1
+        except OSError as e:
+            self.failed.emit(str(e))
+            return
+        self._cursor = QTextCursor(self.document)
+        self._timer.start(0)
+
+    def cancel(self):
+        if self._file is not None:
+            self._stop()
+            self.finished.emit(False)
+
+    def _stop(self):
+        self._timer.stop()
+        self._file.close()
+        self._file = None
+
+    def _step(self):
+        try:
+            chunk = self._file.read(self.chunk_chars)
+        except (OSError, UnicodeDecodeError) as e:
+            self._stop()
+            self.failed.emit(str(e))
+            return
+        if not chunk:
+            self._stop()
+            self.document.setUndoRedoEnabled(True)
+            self.document.setModified(False)
+            self.progress.emit(100)
+            self.finished.emit(True)
+            return
+        self._cursor.insertText(chunk)
+        self.progress.emit(min(99, self._file.buffer.tell() * 100 // self._size))
+
+
+class TableModel(QAbstractTableModel):
+    """Table model over a column-major mdtable.TableData, no per-cell items."""
+
+    def __init__(self, table, parent=None):
+        super().__init__(parent)
+        self.table = table
+
+    def set_table(self, table):
+        self.beginResetModel()
+        self.table = table
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.table.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.table.column_count
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.table.cell(index.row(), index.column())
+        if role == Qt.TextAlignmentRole:
+            alignment = self.table.alignments[index.column()]
+            horizontal = {'right': Qt.AlignRight, 'center': Qt.AlignHCenter}.get(alignment, Qt.AlignLeft)
+            return int(horizontal | Qt.AlignVCenter)
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        self.table.set_cell(index.row(), index.column(), str(value))
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemIsEditable
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.table.headers[section]
+        return str(section + 1)
+
+    def setHeaderData(self, section, orientation, value, role=Qt.EditRole):
+        if orientation != Qt.Horizontal or role != Qt.EditRole:
+            return False
+        self.table.headers[section] = str(value)
+        self.headerDataChanged.emit(orientation, section, section)
+        return True
+
+    def insertRows(self, row, count, parent=QModelIndex()):
+        self.beginInsertRows(parent, row, row + count - 1)
+        self.table.insert_rows(row, count)
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        self.beginRemoveRows(parent, row, row + count - 1)
+        self.table.remove_rows(row, count)
+        self.endRemoveRows()
+        return True
+
+    def insertColumns(self, column, count, parent=QModelIndex()):
+        self.beginInsertColumns(parent, column, column + count - 1)
+        self.table.insert_columns(column, count)
+        self.endInsertColumns()
+        return True
+
+    def removeColumns(self, column, count, parent=QModelIndex()):
+        self.beginRemoveColumns(parent, column, column + count - 1)
+        self.table.remove_columns(column, count)
+        self.endRemoveColumns()
+        return True
+
+
+class TableEditorDialog(QDialog):
+    # Rows sampled when sizing columns to their contents
+    RESIZE_SAMPLE_ROWS = 500
+
+    def __init__(self, table, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Table Editor")
+        self.resize(700, 450)
+        layout = QVBoxLayout(self)
+        self.label = QLabel()
+        layout.addWidget(self.label)
+        self.model = TableModel(table, self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        # Fixed row heights keep scrolling through huge imports cheap
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.horizontalHeader().setResizeContentsPrecision(self.RESIZE_SAMPLE_ROWS)
+        self.view.horizontalHeader().sectionDoubleClicked.connect(self.rename_column)
+        layout.addWidget(self.view)
+        btns = QHBoxLayout()
+        for text, slot in (("Import CSV/TSV...", self.import_file), ("Add Row", self.add_row),
+                           ("Remove Rows", self.remove_rows), ("Add Column", self.add_column),
+                           ("Remove Column", self.remove_column)):
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            btns.addWidget(button)
+        btns.addStretch()
+        self.insert_btn = QPushButton("Insert")
+        self.insert_btn.clicked.connect(self.accept)
+        btns.addWidget(self.insert_btn)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.reject)
+        btns.addWidget(self.cancel_btn)
+        layout.addLayout(btns)
+        self.model.modelReset.connect(self.table_changed)
+        self.model.rowsInserted.connect(self.update_label)
+        self.model.rowsRemoved.connect(self.update_label)
+        self.model.columnsInserted.connect(self.update_label)
+        self.model.columnsRemoved.connect(self.update_label)
+        self.table_changed()
+
+    @property
+    def table(self):
+        return self.model.table
+
+    def table_changed(self):
+        self.view.resizeColumnsToContents()
+        self.update_label()
+
+    def update_label(self):
+        self.label.setText(f"{self.table.row_count} rows x {self.table.column_count} columns. "
+                           "Double-click cells or headers to edit. Click 'Insert' when done.")
+
+    def import_file(self):
+        from PyQt5.QtWidgets import QMessageBox
+        file_name, _ = QFileDialog.getOpenFileName(self, "Import Table", "", "CSV/TSV Files (*.csv *.tsv *.txt);;All Files (*)")
+        if not file_name:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            with open(file_name, 'r', encoding='utf-8-sig', newline='') as f:
+                table = read_delimited(f)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "Import Table", f"Could not read {file_name}:\n{e}")
+            return
+        self.model.set_table(table)
+        QApplication.restoreOverrideCursor()
+
+    def add_row(self):
+        current = self.view.currentIndex()
+        row = current.row() + 1 if current.isValid() else self.model.rowCount()
+        self.model.insertRows(row, 1)
+
+    def remove_rows(self):
+        rows = sorted({index.row() for index in self.view.selectionModel().selectedIndexes()})
+        # Remove contiguous runs bottom-up so earlier row numbers stay valid
+        runs = []
+        for row in rows:
+            if runs and runs[-1][1] == row:
+                runs[-1][1] = row + 1
+            else:
+                runs.append([row, row + 1])
+        for start, end in reversed(runs):
+            self.model.removeRows(start, end - start)
+
+    def add_column(self):
+        current = self.view.currentIndex()
+        column = current.column() + 1 if current.isValid() else self.model.columnCount()
+        self.model.insertColumns(column, 1)
+
+    def remove_column(self):
+        current = self.view.currentIndex()
+        if current.isValid() and self.model.columnCount() > 1:
+            self.model.removeColumns(current.column(), 1)
+
+    def rename_column(self, section):
+        from PyQt5.QtWidgets import QInputDialog
+        name, ok = QInputDialog.getText(self, "Column Header", "Header text:", text=self.table.headers[section])
+        if ok:
+            self.model.setHeaderData(section, Qt.Horizontal, name)
+
+
+class OutlineModel(QAbstractListModel):
+    """List model over ``(line, level, title)`` headings, indented by level, no per-row items."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.headings = []
+
+    def set_headings(self, headings):
+        self.beginResetModel()
+        self.headings = headings
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headings)
+
+    def data(self, index, role=Qt.DisplayRole):
+        line, level, title = self.headings[index.row()]
+        if role == Qt.DisplayRole:
+            return "    " * (level - 1) + (title or "Untitled")
+        if role == Qt.ToolTipRole:
+            return f"Line {line + 1}"
+        return None
+
+
+class WorkspaceSearchDialog(QDialog):
+    """Result list for workspace queries; searches as you type when given ``search``.
+
+    ``search(text)`` returns ``(path, line, label)`` rows and runs on a pool
+    thread once typing pauses; results of a query that was typed over are
+    dropped. Activating a row emits ``opened(path, line)``.
+    """
+    opened = pyqtSignal(str, int)
+    # Milliseconds of typing inactivity before the query runs
+    SEARCH_DEBOUNCE_MS = 200
+
+    def __init__(self, title, search=None, results=(), parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(600, 450)
+        self.search = search
+        layout = QVBoxLayout(self)
+        self.query = QLineEdit()
+        self.query.setPlaceholderText("Search all Markdown files in the workspace")
+        self.query.setVisible(search is not None)
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.timeout.connect(self.run_search)
+        self.query.textChanged.connect(lambda: self._search_timer.start(self.SEARCH_DEBOUNCE_MS))
+        layout.addWidget(self.query)
+        self.results = QListWidget()
+        self.results.itemActivated.connect(self.open_item)
+        layout.addWidget(self.results)
+        self.label = QLabel()
+        layout.addWidget(self.label)
+        # Searches still running, and the latest one, whose results are shown
+        self._searches = set()
+        self._search = None
+        self.show_results(results)
+
+    def run_search(self):
+        text = self.query.text()
+        if not text.strip():
+            self._search = None
+            self.show_results([])
+            return
+        call = BackgroundCall(self.search, text)
+        self._searches.add(call)
+        self._search = call
+        call.signals.succeeded.connect(partial(self.search_finished, call))
+        call.signals.failed.connect(partial(self.search_failed, call))
+        QThreadPool.globalInstance().start(call)
+
+    def search_finished(self, call, results):
+        self._searches.discard(call)
+        if call is self._search:
+            self.show_results(results)
+
+    def search_failed(self, call, message):
+        self._searches.discard(call)
+        if call is self._search:
+            self.results.clear()
+            self.label.setText(f"Search failed: {message}")
+
+    def show_results(self, results):
+        self.results.clear()
+        for path, line, label in results:
+            item = QListWidgetItem(label)
+            item.setData(Qt.UserRole, (path, line))
+            self.results.addItem(item)
+        self.label.setText(f"{len(results)} results")
+
+    def open_item(self, item):
+        path, line = item.data(Qt.UserRole)
+        self.opened.emit(path, line)
+
+
+class DocumentTab:
+    """One open document and the per-document state of the editor around it.
+
+    Only the active tab's document is installed in the editor and previewed.
+    An inactive tab's document may be swapped for its zlib-compressed text,
+    which also drops its undo history; ``document`` is None meanwhile.
+    """
+
+    def __init__(self):
+        self.document = None
+        self.compressed = None
+        self.modified = False
+        self.file = None
+        self.autosave = None
+        self.autosave_lock = None
+        self.autosave_compacting = False
+        self.cursor_position = 0
+        self.editor_scroll = 0
+        self.preview_scroll = 0
+        self.last_used = 0
+        # HeadingIndex, made the first time the outline or a windowed preview needs it
+        self.outline = None
+
+    def is_modified(self):
+        return self.modified if self.document is None else self.document.isModified()
+
+    def title(self):
+        name = os.path.basename(self.file) if self.file else "Untitled"
+        return f"{name} *" if self.is_modified() else name
+
+    def memory_estimate(self):
+        if self.document is None:
+            return len(self.compressed)
+        # QTextDocument holds about 2 bytes per character and a couple of hundred per block
+        return self.document.characterCount() * 2 + self.document.blockCount() * 224
+
+    def compress(self):
+        document = self.document
+        self.modified = document.isModified()
+        # surrogatepass: an edit may have split an emoji
+        self.compressed = zlib.compress(document.toPlainText().encode('utf-8', 'surrogatepass'), 1)
+        self.document = None
+        document.deleteLater()
+
+    def decompress(self):
+        """Return the compressed text; make a document of it and install that with ``attach_document``."""
+        text = zlib.decompress(self.compressed).decode('utf-8', 'surrogatepass')
+        self.compressed = None
+        return text
+
 
 class MarkdownEditor(QMainWindow):
+    # Milliseconds of typing inactivity before the preview re-renders
+    PREVIEW_DEBOUNCE_MS = 150
+    # Render on a worker thread; set False to render synchronously on the GUI thread
+    PREVIEW_ASYNC = True
+    # Files at least this large (bytes) are opened progressively with a progress dialog
+    LARGE_FILE_THRESHOLD = 5 * 1024 * 1024
+    # Documents with at least this many characters only preview the part around the editor's viewport
+    PREVIEW_VIRTUAL_THRESHOLD = 1000000
+    # Source lines rendered above and below the editor's viewport in that mode
+    PREVIEW_WINDOW_MARGIN = 200
+    # Opened Azure tasks kept in the local cache, and seconds before a cached one is revalidated
+    AZURE_CACHE_MAX_ITEMS = 2000
+    AZURE_CACHE_TTL = 600
+    # Memory budget for decoded preview images
+    IMAGE_CACHE_BYTES = 256 * 1024 * 1024
+    # Milliseconds to wait after a change in a watched workspace folder before re-syncing the index
+    WORKSPACE_RESYNC_MS = 1000
+    # Largest blank table the grid editor creates, every cell is a placeholder string up front
+    TABLE_MAX_COLUMNS = 100
+    TABLE_MAX_ROWS = 10000
+    # Milliseconds between autosave journal flushes while typing
+    AUTOSAVE_FLUSH_MS = 1000
+    # The journal is compacted into a snapshot once it outgrows both this and the document
+    AUTOSAVE_COMPACT_BYTES = 1024 * 1024
+    # Milliseconds between refreshes of the latency HUD in the status bar
+    LATENCY_HUD_MS = 1000
+    # Estimated bytes of inactive tabs' documents kept live, the least recently used beyond it are compressed
+    TAB_MEMORY_BUDGET = 256 * 1024 * 1024
+    # Set False to keep every inactive document live whatever the budget
+    TAB_COMPRESS_INACTIVE = True
+    # Decoded preview images kept across a tab switch, the rest of the image cache is released
+    INACTIVE_IMAGE_CACHE_BYTES = 32 * 1024 * 1024
+    # Milliseconds of typing inactivity before the outline panel catches up with the headings
+    OUTLINE_REFRESH_MS = 300
+    # Documents opened with more characters than this are highlighted only where the editor shows them,
+    # a first pass over the whole document costs about 0.5 s per million
+    HIGHLIGHT_MAX_CHARS = 2 * 1024 * 1024
+
+    @property
+    def current_file(self):
+        return self.active_tab.file
+
+    @current_file.setter
+    def current_file(self, file_name):
+        self.active_tab.file = file_name
+        self.update_tab_title(self.active_tab)
+
+    @property
+    def autosave(self):
+        return self.active_tab.autosave
+
     def editor_context_menu(self, pos):
         menu = self.editor.createStandardContextMenu()
         menu.addSeparator()
@@ -34,8 +796,160 @@ class MarkdownEditor(QMainWindow):
         menu.addAction("Image", self.insert_image)
         menu.exec_(self.editor.mapToGlobal(pos))
 
+    def open_files(self, paths):
+        """Open files passed on the command line or by a later launch, and bring the window to the front."""
+        from PyQt5.QtWidgets import QMessageBox
+        self.setWindowState(self.windowState() & ~Qt.WindowMinimized)
+        self.raise_()
+        self.activateWindow()
+        missing = [path for path in paths if not os.path.isfile(path)]
+        for path in paths:
+            if path not in missing:
+                self.load_file(path)
+        if missing:
+            QMessageBox.warning(self, "Open Markdown File", "Not found:\n" + "\n".join(missing))
+
     def new_file(self):
-        self.editor.clear()
+        """Open an empty document in a new tab."""
+        self.add_tab(DocumentTab(), self.create_document())
+        self.start_autosave('')
+
+    def create_document(self, text='', modified=False):
+        """A detached document holding ``text``, syntax highlighted; past HIGHLIGHT_MAX_CHARS only where the editor shows it."""
+        document = QTextDocument()
+        large = len(text) > self.HIGHLIGHT_MAX_CHARS
+        if not large:
+            # Laid out and highlighted while it fills, so the editor has nothing to restyle when it is installed.
+            # A highlighter put on a document that is already laid out relayouts it once per block.
+            document.documentLayout()
+            # Highlighting the still empty document cancels the full pass the highlighter queues for itself
+            MarkdownHighlighter(document).rehighlight()
+        document.setPlainText(text)
+        document.setModified(modified)
+        if large:
+            ViewportHighlighter(document, self.editor)
+        return document
+
+    def add_tab(self, tab, document):
+        self.tabs.append(tab)
+        self.attach_document(tab, document)
+        self.tab_bar.addTab(tab.title())
+        self.tab_bar.setCurrentIndex(len(self.tabs) - 1)
+
+    def attach_document(self, tab, document):
+        # Owned by the window: the editor deletes a replaced document that is its child
+        document.setParent(self)
+        tab.document = document
+        document.modificationChanged.connect(partial(self.update_tab_title, tab))
+
+    def update_tab_title(self, tab, _=None):
+        if tab in self.tabs:
+            index = self.tabs.index(tab)
+            self.tab_bar.setTabText(index, tab.title())
+            self.tab_bar.setTabToolTip(index, tab.file or "")
+
+    def is_blank_tab(self, tab):
+        return tab.file is None and tab.document is not None and tab.document.isEmpty() and not tab.is_modified()
+
+    def find_tab(self, file_name):
+        key = os.path.normcase(os.path.abspath(file_name))
+        for tab in self.tabs:
+            if tab.file and os.path.normcase(os.path.abspath(tab.file)) == key:
+                return tab
+        return None
+
+    def open_document(self, document, file_name, text=None):
+        """Show ``document`` in a new tab that takes the place of a blank active one."""
+        blank = self.active_tab if self.is_blank_tab(self.active_tab) else None
+        self.add_tab(DocumentTab(), document)
+        self.current_file = file_name
+        self.start_autosave(text)
+        if blank is not None:
+            self.discard_tab(blank)
+
+    def on_tab_changed(self, index):
+        tab = self.tabs[index] if 0 <= index < len(self.tabs) else None
+        old = self.active_tab
+        if tab is None or tab is old:
+            return
+        if old is not None:
+            old.document.contentsChange.disconnect(self.on_contents_change)
+            old.cursor_position = self.editor.textCursor().position()
+            old.editor_scroll = self.editor.verticalScrollBar().value()
+            old.preview_scroll = self.preview.verticalScrollBar().value()
+            old.last_used = time.monotonic()
+            if old.autosave is not None:
+                # Nothing more is recorded for it while inactive, write out what is buffered
+                self.run_in_background(old.autosave.flush)
+        self._autosave_timer.stop()
+        self.active_tab = tab
+        if tab.document is None:
+            self.attach_document(tab, self.create_document(tab.decompress(), tab.modified))
+        document = tab.document
+        self.editor.setDocument(document)
+        document.contentsChange.connect(self.on_contents_change)
+        cursor = QTextCursor(document)
+        cursor.setPosition(min(tab.cursor_position, document.characterCount() - 1))
+        self.editor.setTextCursor(cursor)
+        scrollbar = self.editor.verticalScrollBar()
+        scrollbar.setValue(tab.editor_scroll)
+        if scrollbar.value() != tab.editor_scroll:
+            # Not laid out that far yet
+            self.editor.ensureCursorVisible()
+        # Only the active tab keeps rendered HTML and the bulk of the decoded images
+        self.block_renderer.clear()
+        self.preview.image_cache.trim(self.INACTIVE_IMAGE_CACHE_BYTES)
+        self._restore_preview_scroll = tab.preview_scroll
+        self._keystroke_started = None
+        if not self._loading_file:
+            self.preview_scheduler.request(immediate=True)
+        self.trim_inactive_tabs()
+        self.refresh_outline()
+
+    def on_tab_moved(self, from_index, to_index):
+        self.tabs.insert(to_index, self.tabs.pop(from_index))
+
+    def trim_inactive_tabs(self):
+        """Compress the least recently used inactive documents that do not fit in TAB_MEMORY_BUDGET."""
+        if not self.TAB_COMPRESS_INACTIVE:
+            return
+        budget = self.TAB_MEMORY_BUDGET
+        inactive = [tab for tab in self.tabs if tab is not self.active_tab and tab.document is not None]
+        for tab in sorted(inactive, key=lambda tab: tab.last_used, reverse=True):
+            budget -= tab.memory_estimate()
+            if budget < 0:
+                tab.compress()
+
+    def close_tab(self, index):
+        """Close the tab at ``index``, offering to save it first. Returns False when the user cancels."""
+        from PyQt5.QtWidgets import QMessageBox
+        tab = self.tabs[index]
+        if tab.is_modified():
+            self.tab_bar.setCurrentIndex(index)
+            answer = QMessageBox.question(
+                self, "Close Tab", f"Save changes to {tab.file or 'the untitled document'}?",
+                QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel, QMessageBox.Save)
+            if answer == QMessageBox.Cancel:
+                return False
+            if answer == QMessageBox.Save:
+                self.save_file()
+                if tab.is_modified():
+                    return False
+        self.discard_tab(tab)
+        return True
+
+    def discard_tab(self, tab):
+        """Close ``tab`` without asking, dropping its unsaved changes and autosave journal."""
+        if len(self.tabs) == 1:
+            # There is always a tab to type into
+            self.new_file()
+        self.stop_autosave(discard=True, tab=tab)
+        index = self.tabs.index(tab)
+        self.tabs.pop(index)
+        self.tab_bar.removeTab(index)
+        if tab.document is not None:
+            tab.document.deleteLater()
+
     def make_bold(self):
         cursor = self.editor.textCursor()
         if cursor.hasSelection():
@@ -60,7 +974,9 @@ class MarkdownEditor(QMainWindow):
         self.setWindowTitle("Markdown Editor")
         self.setWindowIcon(QIcon("md.ico"))
         self.init_ui()
+        self.new_file()
         self.showMaximized()
+        QTimer.singleShot(0, self.recover_autosave)
 
     def init_ui(self):
         # File Menu
@@ -75,10 +991,47 @@ class MarkdownEditor(QMainWindow):
         save_action = QAction("Save", self)
         save_action.triggered.connect(self.save_file)
         file_menu.addAction(save_action)
+        save_as_action = QAction("Save As", self)
+        save_as_action.triggered.connect(self.save_file_as)
+        file_menu.addAction(save_as_action)
+        close_tab_action = QAction("Close Tab", self)
+        close_tab_action.setShortcut("Ctrl+W")
+        close_tab_action.triggered.connect(lambda: self.close_tab(self.tab_bar.currentIndex()))
+        file_menu.addAction(close_tab_action)
         # Rename 'Create a new task' to 'Publish'
         publish_action = QAction("Publish", self)
         publish_action.triggered.connect(self.create_azure_task)
         file_menu.addAction(publish_action)
+        publish_sections_action = QAction("Publish Sections", self)
+        publish_sections_action.triggered.connect(self.publish_sections)
+        file_menu.addAction(publish_sections_action)
+        open_task_action = QAction("Open Task", self)
+        open_task_action.triggered.connect(self.open_azure_task)
+        file_menu.addAction(open_task_action)
+        open_folder_action = QAction("Open Folder", self)
+        open_folder_action.triggered.connect(self.open_workspace)
+        file_menu.addAction(open_folder_action)
+        search_action = QAction("Search Workspace", self)
+        search_action.setShortcut("Ctrl+Shift+F")
+        search_action.triggered.connect(self.search_workspace)
+        file_menu.addAction(search_action)
+        backlinks_action = QAction("Find Backlinks", self)
+        backlinks_action.triggered.connect(self.find_backlinks)
+        file_menu.addAction(backlinks_action)
+
+        # View Menu
+        view_menu = menubar.addMenu("View")
+        latency_action = QAction("Latency HUD", self)
+        latency_action.setCheckable(True)
+        latency_action.toggled.connect(self.toggle_latency_hud)
+        view_menu.addAction(latency_action)
+        export_trace_action = QAction("Export Latency Trace", self)
+        export_trace_action.triggered.connect(self.export_latency_trace)
+        view_menu.addAction(export_trace_action)
+        reset_latency_action = QAction("Reset Latency Stats", self)
+        reset_latency_action.triggered.connect(TRACER.reset)
+        view_menu.addAction(reset_latency_action)
+        view_menu.addSeparator()
 
         # Add all toolbar actions (Normal, Bold, Italic, etc.)
         # ...existing code for adding actions to format_toolbar...
@@ -88,8 +1041,7 @@ class MarkdownEditor(QMainWindow):
         self.editor = QTextEdit()
         self.editor.setContextMenuPolicy(Qt.CustomContextMenu)
         self.editor.customContextMenuRequested.connect(self.editor_context_menu)
-        self.preview = QTextEdit()
-        self.preview.setReadOnly(True)
+        self.preview = PreviewPane(cache_bytes=self.IMAGE_CACHE_BYTES)
         splitter.addWidget(self.editor)
         splitter.addWidget(self.preview)
         splitter.setSizes([600, 600])
@@ -98,97 +1050,233 @@ class MarkdownEditor(QMainWindow):
         central_widget = QWidget()
         layout = QVBoxLayout(central_widget)
         # Remove open_btn from btn_layout and UI
+        self.tabs = []
+        self.active_tab = None
+        self.tab_bar = QTabBar()
+        self.tab_bar.setTabsClosable(True)
+        self.tab_bar.setMovable(True)
+        self.tab_bar.setDocumentMode(True)
+        self.tab_bar.setExpanding(False)
+        self.tab_bar.currentChanged.connect(self.on_tab_changed)
+        self.tab_bar.tabCloseRequested.connect(self.close_tab)
+        self.tab_bar.tabMoved.connect(self.on_tab_moved)
+        layout.addWidget(self.tab_bar)
         layout.addWidget(splitter)
         self.setCentralWidget(central_widget)
 
+        # Outline dock, hidden until View > Outline
+        self.outline_model = OutlineModel(self)
+        self.outline_filter = QLineEdit()
+        self.outline_filter.setPlaceholderText("Filter headings")
+        self.outline_filter.setClearButtonEnabled(True)
+        self.outline_filter.textChanged.connect(self.refresh_outline)
+        self.outline_filter.returnPressed.connect(lambda: self.outline_activated(self.outline_model.index(0)))
+        self.outline_view = QListView()
+        self.outline_view.setModel(self.outline_model)
+        # Rows are never measured one by one, tens of thousands of headings list at once
+        self.outline_view.setUniformItemSizes(True)
+        self.outline_view.setEditTriggers(QListView.NoEditTriggers)
+        self.outline_view.clicked.connect(self.outline_activated)
+        self.outline_view.activated.connect(self.outline_activated)
+        outline_widget = QWidget()
+        outline_layout = QVBoxLayout(outline_widget)
+        outline_layout.setContentsMargins(0, 0, 0, 0)
+        outline_layout.addWidget(self.outline_filter)
+        outline_layout.addWidget(self.outline_view)
+        self.outline_dock = QDockWidget("Outline", self)
+        self.outline_dock.setObjectName("outline")
+        self.outline_dock.setWidget(outline_widget)
+        self.outline_dock.visibilityChanged.connect(self.refresh_outline)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.outline_dock)
+        self.outline_dock.hide()
+        outline_action = self.outline_dock.toggleViewAction()
+        outline_action.setShortcut("Ctrl+Shift+O")
+        view_menu.addAction(outline_action)
+
         # Connect editor changes to preview
+        self._loading_file = False
+        self._azure_client = None
+        self._workitem_cache = None
+        self._workitem_refreshing = False
+        self._background_calls = set()
+        self.block_renderer = BlockRenderer()
+        self._preview_window = None
+        self._preview_anchors = []
+        self._restore_preview_scroll = None
+        self.workspace = None
+        self._workspace_syncing = False
+        self._workspace_resync = False
+        self._workspace_watcher = QFileSystemWatcher(self)
+        self._workspace_watcher.directoryChanged.connect(self.workspace_changed)
+        # Saves that rewrite a file in place change no folder
+        self._workspace_watcher.fileChanged.connect(self.reindex_workspace_file)
+        self._workspace_timer = QTimer(self)
+        self._workspace_timer.setSingleShot(True)
+        self._workspace_timer.timeout.connect(self.sync_workspace)
+        self._autosave_timer = QTimer(self)
+        self._autosave_timer.setSingleShot(True)
+        self._autosave_timer.timeout.connect(self.flush_autosave)
+        # Time of the first edit the preview has not caught up with yet, while tracing
+        self._keystroke_started = None
+        self.latency_label = QLabel()
+        self.latency_label.hide()
+        self.statusBar().addPermanentWidget(self.latency_label)
+        self._latency_timer = QTimer(self)
+        self._latency_timer.timeout.connect(self.update_latency_hud)
+        self._outline_timer = QTimer(self)
+        self._outline_timer.setSingleShot(True)
+        self._outline_timer.timeout.connect(self.refresh_outline)
+        self.preview_scheduler = PreviewScheduler(
+            self.preview_source,
+            render=self.render_preview,
+            debounce_ms=self.PREVIEW_DEBOUNCE_MS,
+            async_render=self.PREVIEW_ASYNC,
+            parent=self,
+        )
+        self.preview_scheduler.rendered.connect(self.set_preview_html)
         self.editor.textChanged.connect(self.update_preview)
+        self.editor.verticalScrollBar().valueChanged.connect(self.on_editor_scrolled)
 
-    def create_azure_task(self):
-        from PyQt5.QtWidgets import QInputDialog, QMessageBox
-        import requests
-        import base64
+    def run_in_background(self, func, *args, on_success=None, on_error=None):
+        call = BackgroundCall(func, *args)
+        # Hold on to the call until it reports back, the signals live on it
+        self._background_calls.add(call)
+
+        def finish(handler, value):
+            self._background_calls.discard(call)
+            if handler is not None:
+                handler(value)
+
+        call.signals.succeeded.connect(partial(finish, on_success))
+        call.signals.failed.connect(partial(finish, on_error))
+        QThreadPool.globalInstance().start(call)
+
+    def azure_client(self):
+        from PyQt5.QtWidgets import QInputDialog
         # Prompt for credentials if not set
         if not hasattr(self, '_azure_org_url'):
             org_url, ok = QInputDialog.getText(self, "Azure DevOps Org URL", "e.g. https://dev.azure.com/yourorg")
             if not ok or not org_url.strip():
-                return
+                return None
             self._azure_org_url = org_url.strip()
         if not hasattr(self, '_azure_project'):
             project, ok = QInputDialog.getText(self, "Azure Project Name", "Enter Azure DevOps project name:")
             if not ok or not project.strip():
-                return
+                return None
             self._azure_project = project.strip()
         if not hasattr(self, '_azure_pat'):
             pat, ok = QInputDialog.getText(self, "Azure Personal Access Token", "Enter Azure DevOps PAT:")
             if not ok or not pat.strip():
-                return
+                return None
             self._azure_pat = pat.strip()
+        if self._azure_client is None:
+            from azure_boards import AzureBoardsClient
+            self._azure_client = AzureBoardsClient(self._azure_org_url, self._azure_project, self._azure_pat)
+        return self._azure_client
+
+    def azure_error(self, message):
+        from PyQt5.QtWidgets import QMessageBox
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Azure Task Error", message)
+
+    def create_azure_task(self):
+        from PyQt5.QtWidgets import QInputDialog, QMessageBox
+        client = self.azure_client()
+        if client is None:
+            return
         title, ok1 = QInputDialog.getText(self, "Azure Task Title", "Enter task title:")
         if not ok1 or not title.strip():
             return
         desc, ok2 = QInputDialog.getMultiLineText(self, "Azure Task Description", "Enter task description:")
         if not ok2:
             return
-        # Azure Boards API call
-        url = f"{self._azure_org_url}/{self._azure_project}/_apis/wit/workitems/$Task?api-version=6.0"
-        headers = {
-            'Content-Type': 'application/json-patch+json',
-            'Authorization': 'Basic ' + base64.b64encode(f':{self._azure_pat}'.encode()).decode()
-        }
-        data = [
-            {"op": "add", "path": "/fields/System.Title", "from": None, "value": title},
-            {"op": "add", "path": "/fields/System.Description", "from": None, "value": desc}
-        ]
-        try:
-            resp = requests.post(url, headers=headers, json=data)
-            if resp.status_code == 200 or resp.status_code == 201:
-                workitem = resp.json()
-                task_id = workitem.get('id', 'Unknown')
-                QMessageBox.information(self, "Azure Task", f"Task Created!\nID: {task_id}\nTitle: {title}")
-            else:
-                QMessageBox.warning(self, "Azure Task Error", f"Failed to create task.\nStatus: {resp.status_code}\n{resp.text}")
-        except Exception as e:
-            QMessageBox.critical(self, "Azure Task Error", f"Exception: {e}")
+
+        def created(workitem):
+            self.statusBar().clearMessage()
+            task_id = workitem.get('id', 'Unknown')
+            QMessageBox.information(self, "Azure Task", f"Task Created!\nID: {task_id}\nTitle: {title}")
+
+        self.statusBar().showMessage("Creating Azure task...")
+        self.run_in_background(client.create_task, title, desc, on_success=created, on_error=self.azure_error)
+
+    def publish_sections(self):
+        from PyQt5.QtWidgets import QMessageBox
+        sections = split_sections(self.editor.toPlainText(), level=2)
+        if not sections:
+            QMessageBox.information(self, "Publish Sections", "The document has no level 2 headings to publish.")
+            return
+        reply = QMessageBox.question(self, "Publish Sections", f"Create {len(sections)} Azure tasks, one per level 2 heading?")
+        if reply != QMessageBox.Yes:
+            return
+        client = self.azure_client()
+        if client is None:
+            return
+        tasks = [(title or "Untitled", render_fragment(body)) for title, body in sections]
+
+        def created(workitems):
+            self.statusBar().clearMessage()
+            ids = ', '.join(str(w.get('id', '?')) for w in workitems)
+            QMessageBox.information(self, "Publish Sections", f"Created {len(workitems)} tasks.\nIDs: {ids}")
+
+        self.statusBar().showMessage(f"Creating {len(tasks)} Azure tasks...")
+        self.run_in_background(client.create_tasks, tasks, on_success=created, on_error=self.azure_error)
 
     def open_azure_task(self):
         from PyQt5.QtWidgets import QInputDialog, QMessageBox
-        import requests
-        import base64
-        # Prompt for credentials if not set
-        if not hasattr(self, '_azure_org_url'):
-            org_url, ok = QInputDialog.getText(self, "Azure DevOps Org URL", "e.g. https://dev.azure.com/yourorg")
-            if not ok or not org_url.strip():
-                return
-            self._azure_org_url = org_url.strip()
-        if not hasattr(self, '_azure_project'):
-            project, ok = QInputDialog.getText(self, "Azure Project Name", "Enter Azure DevOps project name:")
-            if not ok or not project.strip():
-                return
-            self._azure_project = project.strip()
-        if not hasattr(self, '_azure_pat'):
-            pat, ok = QInputDialog.getText(self, "Azure Personal Access Token", "Enter Azure DevOps PAT:")
-            if not ok or not pat.strip():
-                return
-            self._azure_pat = pat.strip()
+        client = self.azure_client()
+        if client is None:
+            return
         task_id, ok = QInputDialog.getText(self, "Azure Task ID", "Enter Azure Boards Task ID:")
         if not ok or not task_id.strip():
             return
-        url = f"{self._azure_org_url}/{self._azure_project}/_apis/wit/workitems/{task_id.strip()}?api-version=6.0"
-        headers = {
-            'Authorization': 'Basic ' + base64.b64encode(f':{self._azure_pat}'.encode()).decode()
-        }
-        try:
-            resp = requests.get(url, headers=headers)
-            if resp.status_code == 200:
-                workitem = resp.json()
-                title = workitem['fields'].get('System.Title', 'No Title')
-                desc = workitem['fields'].get('System.Description', 'No Description')
-                QMessageBox.information(self, "Azure Task", f"ID: {task_id}\nTitle: {title}\nDescription: {desc}")
-            else:
-                QMessageBox.warning(self, "Azure Task Error", f"Failed to fetch task.\nStatus: {resp.status_code}\n{resp.text}")
-        except Exception as e:
-            QMessageBox.critical(self, "Azure Task Error", f"Exception: {e}")
+        task_id = task_id.strip()
+        if not task_id.isdigit():
+            QMessageBox.warning(self, "Azure Task Error", f"Invalid task ID: {task_id}")
+            return
+        cache = self.workitem_cache()
+
+        def show(workitem):
+            title = workitem['fields'].get('System.Title', 'No Title')
+            desc = workitem['fields'].get('System.Description', 'No Description')
+            QMessageBox.information(self, "Azure Task", f"ID: {task_id}\nTitle: {title}\nDescription: {desc}")
+
+        def fetched(workitem):
+            self.statusBar().clearMessage()
+            cache.put(client.org_url, client.project, [workitem])
+            show(workitem)
+
+        cached = cache.get(client.org_url, client.project, task_id)
+        if cached is None:
+            self.statusBar().showMessage("Fetching Azure task...")
+            self.run_in_background(client.get_work_item, task_id, on_success=fetched, on_error=self.azure_error)
+            return
+        workitem, fresh = cached
+        if not fresh:
+            self.refresh_workitem_cache(int(task_id))
+        show(workitem)
+
+    def workitem_cache(self):
+        if self._workitem_cache is None:
+            from workitem_cache import WorkItemCache
+            self._workitem_cache = WorkItemCache(max_items=self.AZURE_CACHE_MAX_ITEMS, ttl=self.AZURE_CACHE_TTL)
+        return self._workitem_cache
+
+    def refresh_workitem_cache(self, watched_id=None):
+        # One refresh covers every stale item, don't stack them up
+        if self._workitem_refreshing:
+            return
+        self._workitem_refreshing = True
+
+        def refreshed(changed):
+            self._workitem_refreshing = False
+            if watched_id in changed:
+                self.statusBar().showMessage(f"Azure task {watched_id} changed on the server, open it again to see the latest version", 10000)
+
+        def failed(message):
+            self._workitem_refreshing = False
+            self.statusBar().showMessage(f"Refreshing cached Azure tasks failed: {message}", 10000)
+
+        self.run_in_background(self.workitem_cache().refresh, self._azure_client, on_success=refreshed, on_error=failed)
 
     def insert_inline_code(self):
         cursor = self.editor.textCursor()
@@ -200,42 +1288,10 @@ class MarkdownEditor(QMainWindow):
             cursor.movePosition(cursor.Left, cursor.MoveAnchor, 1)
             self.editor.setTextCursor(cursor)
     def insert_normal_text(self):
-        import re
         cursor = self.editor.textCursor()
         if cursor.hasSelection():
-            text = cursor.selectedText()
-            # Remove code blocks (```...```)
-            text = re.sub(r'```[\s\S]*?```', '', text)
-            # Remove inline code
-            text = re.sub(r'`([^`]+)`', r'\1', text)
-            # Remove bold, italic, strikethrough, highlight (nested and simple)
-            text = re.sub(r'(\*\*|__)(.*?)\1', r'\2', text)  # bold
-            text = re.sub(r'(\*|_)(.*?)\1', r'\2', text)     # italic
-            text = re.sub(r'~~(.*?)~~', r'\1', text)           # strikethrough
-            text = re.sub(r'==(.*?)==', r'\1', text)           # highlight
-            # Remove headings
-            text = re.sub(r'^\s*#{1,6}\s*', '', text, flags=re.MULTILINE)
-            # Remove blockquotes
-            text = re.sub(r'^\s*>\s*', '', text, flags=re.MULTILINE)
-            # Remove unordered and ordered lists
-            text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
-            text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
-            # Remove checklists
-            text = re.sub(r'- \[[ xX]\] ', '', text)
-            # Remove links/images, keep text
-            text = re.sub(r'!\[([^\]]*)\]\([^\)]*\)', r'\1', text)  # images
-            text = re.sub(r'\[([^\]]+)\]\([^\)]*\)', r'\1', text)   # links
-            # Remove HTML tags
-            text = re.sub(r'<[^>]+>', '', text)
-            # Remove comments
-            text = re.sub(r'<!--.*?-->', '', text, flags=re.DOTALL)
-            # Remove table pipes and headers
-            text = re.sub(r'\|', '', text)
-            text = re.sub(r'^\s*-{3,}\s*$', '', text, flags=re.MULTILINE)  # table header lines
-            # Remove extra whitespace and collapse newlines
-            text = re.sub(r'\s+\n', '\n', text)
-            text = re.sub(r'\n+', '\n', text)
-            text = text.strip()
+            # Line-anchored rules need real newlines, not U+2029
+            text = strip_markdown(cursor.selectedText().replace("\u2029", "\n"))
             # Replace selection with cleaned text
             cursor.beginEditBlock()
             cursor.removeSelectedText()
@@ -311,10 +1367,16 @@ class MarkdownEditor(QMainWindow):
                 cursor.insertText(f'![alt text]({file_name})')
 
     def insert_table(self):
-        from PyQt5.QtWidgets import QInputDialog, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QLabel
-        import sys
+        from PyQt5.QtWidgets import QInputDialog
         from tabulate import tabulate
 
+        found = self.table_under_cursor()
+        if found:
+            # Cursor is inside an existing table, edit it in place
+            first, last, table = found
+            self.edit_table(table, replace=(first, last))
+            return
+
         # Ask user for formatter type
         formatter, ok = QInputDialog.getItem(self, "Table Formatter", "Choose table formatter:", ["Grid Editor (GUI)", "Tabulate (Pretty Markdown)", "Simple Markdown"], 0, False)
         if not ok:
@@ -350,77 +1412,574 @@ class MarkdownEditor(QMainWindow):
             return
 
         # Grid Editor (GUI)
-        class TableDialog(QDialog):
-            def __init__(self, parent=None):
-                super().__init__(parent)
-                self.setWindowTitle("Table Editor")
-                self.resize(600, 400)
-                layout = QVBoxLayout(self)
-                self.label = QLabel("Double-click cells to edit. Click 'Insert' when done.")
-                layout.addWidget(self.label)
-                self.table = QTableWidget(rows, cols)
-                self.table.setHorizontalHeaderLabels([f"Header {i+1}" for i in range(cols)])
-                for r in range(rows):
-                    for c in range(cols):
-                        self.table.setItem(r, c, QTableWidgetItem(f"Cell {r+1},{c+1}"))
-                layout.addWidget(self.table)
-                btns = QHBoxLayout()
-                self.insert_btn = QPushButton("Insert")
-                self.insert_btn.clicked.connect(self.accept)
-                btns.addWidget(self.insert_btn)
-                self.cancel_btn = QPushButton("Cancel")
-                self.cancel_btn.clicked.connect(self.reject)
-                btns.addWidget(self.cancel_btn)
-                layout.addLayout(btns)
-            def get_table(self):
-                headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
-                data = []
-                for r in range(self.table.rowCount()):
-                    row = []
-                    for c in range(self.table.columnCount()):
-                        item = self.table.item(r, c)
-                        row.append(item.text() if item else "")
-                    data.append(row)
-                return headers, data
-        # Ask for size
-        cols, ok1 = QInputDialog.getInt(self, "Table Columns", "Enter number of columns:", 2, 1, 20)
+        cols, ok1 = QInputDialog.getInt(self, "Table Columns", "Enter number of columns:", 2, 1, self.TABLE_MAX_COLUMNS)
         if not ok1:
             return
-        rows, ok2 = QInputDialog.getInt(self, "Table Rows", "Enter number of rows:", 2, 1, 50)
+        rows, ok2 = QInputDialog.getInt(self, "Table Rows", "Enter number of rows:", 2, 1, self.TABLE_MAX_ROWS)
         if not ok2:
             return
-        dlg = TableDialog(self)
-        if dlg.exec_() == QDialog.Accepted:
-            headers, data = dlg.get_table()
-            table_md = tabulate(data, headers, tablefmt="github")
-            self.editor.insertPlainText(table_md + "\n")
+        self.edit_table(TableData.blank(rows, cols))
+
+    def table_under_cursor(self):
+        """Return ``(first_block, last_block, table)`` for the Markdown table at the cursor, or None.
+
+        A table needs a header row followed by a delimiter row; other lines
+        that merely contain a pipe are not one.
+        """
+        block = self.editor.textCursor().block()
+        if not is_table_line(block.text()):
+            return None
+        # Walk out from the cursor line only, the rest of the document is never read
+        first = block
+        while first.previous().isValid() and is_table_line(first.previous().text()):
+            first = first.previous()
+        last = block
+        while last.next().isValid() and is_table_line(last.next().text()):
+            last = last.next()
+        # The header sits right above the first delimiter row, piped lines before it are not part of the table
+        while first != last and not DELIMITER_ROW_RE.match(first.next().text()):
+            first = first.next()
+        if first == last or first.blockNumber() > block.blockNumber():
+            return None
+        lines = []
+        current = first
+        while True:
+            lines.append(current.text())
+            if current == last:
+                break
+            current = current.next()
+        table = parse_table(lines)
+        return (first, last, table) if table is not None else None
+
+    def edit_table(self, table, replace=None):
+        """Open the grid editor on ``table``; insert the result or replace the ``(first, last)`` blocks."""
+        dlg = TableEditorDialog(table, self)
+        if dlg.exec_() != QDialog.Accepted:
+            return
+        cursor = self.editor.textCursor()
+        # Rows go into the document a chunk at a time, the Markdown is never held whole; one undo step
+        cursor.beginEditBlock()
+        if replace:
+            first, last = replace
+            cursor.setPosition(first.position())
+            cursor.setPosition(last.position() + last.length() - 1, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+        write_table(dlg.table, cursor.insertText)
+        if replace:
+            # The line break after the last row is already there
+            cursor.deletePreviousChar()
+        cursor.endEditBlock()
 
     def open_file(self):
         file_name, _ = QFileDialog.getOpenFileName(self, "Open Markdown File", "", "Markdown Files (*.md)")
         if file_name:
+            self.load_file(file_name)
+
+    def load_file(self, file_name, line=None):
+        tab = self.find_tab(file_name)
+        if tab is not None:
+            self.tab_bar.setCurrentIndex(self.tabs.index(tab))
+            if line is not None:
+                self.goto_line(line)
+            return
+        if os.path.getsize(file_name) >= self.LARGE_FILE_THRESHOLD:
+            self.load_large_file(file_name, line)
+            return
+        with TRACER.span('read_file', path=file_name):
             with open(file_name, 'r', encoding='utf-8') as f:
-                self.editor.setPlainText(f.read())
+                text = f.read()
+        # Filled before it is shown, so nothing is laid out twice
+        self.open_document(self.create_document(text), file_name, text)
+        if line is not None:
+            self.goto_line(line)
+
+    def goto_line(self, line):
+        block = self.editor.document().findBlockByNumber(line)
+        if block.isValid():
+            cursor = self.editor.textCursor()
+            cursor.setPosition(block.position())
+            self.editor.setTextCursor(cursor)
+            self.editor.ensureCursorVisible()
+
+    def refresh_outline(self, _=None):
+        if not self.outline_dock.isVisible():
+            return
+        headings = self.heading_index().filter(self.outline_filter.text())
+        if headings != self.outline_model.headings:
+            scrollbar = self.outline_view.verticalScrollBar()
+            pos = scrollbar.value()
+            self.outline_model.set_headings(headings)
+            scrollbar.setValue(pos)
+
+    def heading_index(self):
+        """The active tab's HeadingIndex, made on first use."""
+        tab = self.active_tab
+        if tab.outline is None:
+            # The only full scan, later edits patch the index
+            tab.outline = HeadingIndex(self.editor.toPlainText())
+        return tab.outline
+
+    def patch_outline(self, index, position, added):
+        """Re-read the lines a contentsChange touched into ``index``."""
+        document = self.editor.document()
+        limit = document.characterCount() - 1
+        block = document.findBlock(min(position, limit))
+        first = block.blockNumber()
+        last = document.findBlock(min(position + added, limit)).blockNumber()
+        lines = []
+        for _ in range(last - first + 1):
+            lines.append(block.text())
+            block = block.next()
+        # Lines the edit replaced: the ones it left, less what it added to the document
+        count = last - first + 1 - (document.blockCount() - index.line_count)
+        if not index.replace_lines(first, count, lines):
+            index.reset(document.toPlainText())
+        if self.outline_dock.isVisible() and not self._outline_timer.isActive():
+            self._outline_timer.start(self.OUTLINE_REFRESH_MS)
+
+    def outline_activated(self, index):
+        if index.isValid():
+            self.jump_to_line(self.outline_model.headings[index.row()][0])
+
+    def jump_to_line(self, line):
+        """Put ``line`` at the top of the editor and bring its block into the preview."""
+        document = self.editor.document()
+        block = document.findBlockByNumber(line)
+        if not block.isValid():
+            return
+        self.editor.setTextCursor(QTextCursor(block))
+        # Virtual previews follow the editor's scroll bar, whole ones are scrolled to the line's anchor
+        top = document.documentLayout().blockBoundingRect(block).top()
+        self.editor.verticalScrollBar().setValue(int(top))
+        if self._preview_window is None:
+            self.scroll_preview_to_line(line)
+        self.editor.setFocus()
+
+    def load_large_file(self, file_name, line=None):
+        from PyQt5.QtWidgets import QProgressDialog, QMessageBox
+        # Keep the preview idle and the editor locked until the whole file is in
+        self._loading_file = True
+        self.editor.setReadOnly(True)
+        dlg = QProgressDialog(f"Opening {os.path.basename(file_name)}...", "Cancel", 0, 100, self)
+        dlg.setWindowTitle("Open Markdown File")
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setMinimumDuration(0)
+        loader = LargeFileLoader(file_name, parent=self)
+        started = time.perf_counter()
+        loader.progress.connect(dlg.setValue)
+        dlg.canceled.connect(loader.cancel)
+
+        def done(completed):
+            dlg.reset()
+            loader.deleteLater()
+            self.editor.setReadOnly(False)
+            self._loading_file = False
+            if completed:
+                TRACER.record('read_large_file', started, time.perf_counter(), {'path': file_name})
+                # A cancelled load leaves the current document untouched
+                ViewportHighlighter(loader.document, self.editor)
+                self.open_document(loader.document, file_name)
+                if line is not None:
+                    self.goto_line(line)
+
+        def failed(message):
+            done(False)
+            QMessageBox.warning(self, "Open Markdown File", f"Failed to open {file_name}:\n{message}")
+
+        loader.finished.connect(done)
+        loader.failed.connect(failed)
+        loader.start()
 
     def save_file(self):
-        file_name, _ = QFileDialog.getSaveFileName(self, "Save Markdown File", "", "Markdown Files (*.md)")
+        if self.current_file is None:
+            self.save_file_as()
+            return
+        self.write_file(self.current_file)
+
+    def save_file_as(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Markdown File", self.current_file or "", "Markdown Files (*.md)")
         if file_name:
-            with open(file_name, 'w', encoding='utf-8') as f:
-                f.write(self.editor.toPlainText())
+            self.write_file(file_name)
+
+    def write_file(self, file_name):
+        from PyQt5.QtWidgets import QMessageBox
+        try:
+            # A crash mid-save leaves the previous version in place
+            with TRACER.span('write_file', path=file_name):
+                atomic_write(file_name, self.editor.toPlainText(), newline=None)
+        except OSError as e:
+            QMessageBox.warning(self, "Save Markdown File", f"Failed to save {file_name}:\n{e}")
+            return
+        self.current_file = file_name
+        self.editor.document().setModified(False)
+        if self.autosave is not None:
+            self.autosave.set_source_file(file_name)
+        self.reindex_workspace_file(file_name)
+
+    def start_autosave(self, text=None):
+        """Begin a fresh journal for the document now in the editor; ``text`` is its content if already at hand."""
+        self.stop_autosave(discard=True)
+        tab = self.active_tab
+        session = AutosaveSession.create(source_file=tab.file)
+        # Tells a later start-up that this session's owner is still running
+        lock = QLockFile(os.path.join(session.path, 'lock'))
+        lock.tryLock(0)
+        tab.autosave, tab.autosave_lock = session, lock
+        tab.autosave_compacting = False
+        text = self.editor.toPlainText() if text is None else text
+        self.run_in_background(session.finish_compaction, 0, text)
+
+    def stop_autosave(self, discard, tab=None):
+        tab = tab or self.active_tab
+        if tab is self.active_tab:
+            self._autosave_timer.stop()
+        if tab.autosave is None:
+            return
+        session, lock = tab.autosave, tab.autosave_lock
+        tab.autosave = tab.autosave_lock = None
+        lock.unlock()
+        if discard:
+            session.discard()
+        else:
+            session.close()
+
+    def on_contents_change(self, position, removed, added):
+        if self.active_tab.outline is not None:
+            self.patch_outline(self.active_tab.outline, position, added)
+        if self.autosave is None or self._loading_file:
+            return
+        document = self.editor.document()
+        end = position + added
+        limit = document.characterCount() - 1
+        cursor = QTextCursor(document)
+        cursor.setPosition(min(position, limit))
+        cursor.setPosition(min(end, limit), QTextCursor.KeepAnchor)
+        text = cursor.selectedText().replace("\u2029", "\n")
+        if end > limit:
+            # The change covers the document's final block separator
+            text += "\n"
+        self.autosave.record(position, removed, text)
+        if not self._autosave_timer.isActive():
+            self._autosave_timer.start(self.AUTOSAVE_FLUSH_MS)
+
+    def flush_autosave(self):
+        tab = self.active_tab
+        session = tab.autosave
+        if session is None:
+            return
+        # Compact only once the journal outgrows the document, so autosave I/O follows the edit rate
+        limit = max(self.AUTOSAVE_COMPACT_BYTES, self.editor.document().characterCount())
+        if tab.autosave_compacting or session.journal_bytes < limit:
+            self.run_in_background(session.flush)
+            return
+        tab.autosave_compacting = True
+        generation = session.begin_compaction()
+
+        def compacted(_=None):
+            if session is tab.autosave:
+                tab.autosave_compacting = False
+
+        self.run_in_background(session.finish_compaction, generation, self.editor.toPlainText(),
+                               on_success=compacted, on_error=compacted)
+
+    def recover_autosave(self):
+        """Offer the journal of a session whose editor exited without closing it."""
+        from PyQt5.QtWidgets import QMessageBox
+        for path in find_sessions():
+            lock = QLockFile(os.path.join(path, 'lock'))
+            # Only a lock whose process is gone counts as stale, however old it is
+            lock.setStaleLockTime(0)
+            if not lock.tryLock(0):
+                continue
+            recovered = read_session(path)
+            if recovered is None:
+                lock.unlock()
+                remove_session(path)
+                continue
+            source_file, text = recovered
+            answer = QMessageBox.question(
+                self, "Recover Unsaved Changes",
+                f"Unsaved changes to {source_file or 'an untitled document'} were found. Recover them?",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Discard, QMessageBox.Yes)
+            lock.unlock()
+            if answer == QMessageBox.No:
+                # Keep it for the next start-up
+                continue
+            remove_session(path)
+            if answer == QMessageBox.Yes:
+                self.open_document(self.create_document(text, modified=True), source_file, text)
+
+    def closeEvent(self, event):
+        # Unsaved work stays in the journal and is offered again on the next start
+        for tab in self.tabs:
+            self.stop_autosave(discard=not tab.is_modified(), tab=tab)
+        super().closeEvent(event)
+
+    def open_workspace(self):
+        from workspace_index import WorkspaceIndex
+        folder = QFileDialog.getExistingDirectory(self, "Open Folder")
+        if not folder:
+            return
+        if self.workspace is not None:
+            # A sync still running keeps its own reference until it finishes
+            old = self.workspace
+            self.workspace = None
+            if not self._workspace_syncing:
+                old.close()
+        self.workspace = WorkspaceIndex(folder)
+        self.setWindowTitle(f"Markdown Editor - {folder}")
+        self.sync_workspace()
+
+    def workspace_changed(self, path):
+        self._workspace_timer.start(self.WORKSPACE_RESYNC_MS)
+
+    def sync_workspace(self):
+        """Bring the workspace index up to date on a worker thread."""
+        if self.workspace is None:
+            return
+        if self._workspace_syncing:
+            # Run again once the current pass is done, it may have missed this change
+            self._workspace_resync = True
+            return
+        self._workspace_syncing = True
+        workspace = self.workspace
+        self.statusBar().showMessage(f"Indexing {workspace.root}...")
+
+        def sync():
+            # The walk also lists the folders and files to watch, so the GUI thread never touches the disk
+            folders = []
+            files = []
+            return workspace.sync(folders=folders, files=files), folders, files
+
+        def finished(result):
+            changed, folders, files = result
+            self._workspace_syncing = False
+            if workspace is not self.workspace:
+                workspace.close()
+                self.sync_workspace()
+                return
+            self.statusBar().showMessage(f"Workspace indexed: {workspace.file_count()} files, {changed} updated", 5000)
+            self.watch_workspace(folders, files)
+            if self._workspace_resync:
+                self._workspace_resync = False
+                self.sync_workspace()
+
+        def failed(message):
+            self._workspace_syncing = False
+            self.statusBar().showMessage(f"Indexing failed: {message}", 10000)
+
+        self.run_in_background(sync, on_success=finished, on_error=failed)
+
+    def watch_workspace(self, folders, files):
+        # Folder events cover files added, removed or replaced by a save-and-rename,
+        # file events the ones written in place
+        watcher = self._workspace_watcher
+        for watched, paths in ((watcher.directories(), folders), (watcher.files(), files)):
+            watched = set(watched)
+            stale = list(watched.difference(paths))
+            if stale:
+                watcher.removePaths(stale)
+            new = [p for p in paths if p not in watched]
+            if new:
+                watcher.addPaths(new)
+
+    def reindex_workspace_file(self, file_name):
+        if self.workspace is None:
+            return
+        rel_path = self.workspace.relative_path(file_name)
+        if rel_path is not None and rel_path.lower().endswith('.md'):
+            self.run_in_background(self.workspace.index_file, rel_path)
+
+    def search_workspace(self):
+        from PyQt5.QtWidgets import QMessageBox
+        if self.workspace is None:
+            QMessageBox.information(self, "Search Workspace", "Open a folder first (File > Open Folder).")
+            return
+        workspace = self.workspace
+
+        def search(text):
+            results = []
+            for path, hits, heading in workspace.search(text):
+                if heading:
+                    results.append((path, heading[0], f"{path}: {heading[1]}  ({hits} hits)"))
+                else:
+                    results.append((path, 0, f"{path}  ({hits} hits)"))
+            return results
+
+        dlg = WorkspaceSearchDialog("Search Workspace", search=search, parent=self)
+        dlg.opened.connect(self.open_workspace_file)
+        dlg.show()
+
+    def find_backlinks(self):
+        from PyQt5.QtWidgets import QMessageBox
+        rel_path = self.workspace.relative_path(self.current_file) if self.workspace and self.current_file else None
+        if rel_path is None:
+            QMessageBox.information(self, "Find Backlinks", "Open a file from the current workspace folder first.")
+            return
+        workspace = self.workspace
+
+        def backlinks():
+            return [(path, line, f"{path}:{line + 1}") for path, line in workspace.backlinks(rel_path)]
+
+        def found(results):
+            self.statusBar().clearMessage()
+            dlg = WorkspaceSearchDialog(f"Backlinks to {rel_path}", results=results, parent=self)
+            dlg.opened.connect(self.open_workspace_file)
+            dlg.show()
+
+        def failed(message):
+            self.statusBar().showMessage(f"Finding backlinks failed: {message}", 10000)
+
+        self.statusBar().showMessage(f"Finding backlinks to {rel_path}...")
+        self.run_in_background(backlinks, on_success=found, on_error=failed)
+
+    def open_workspace_file(self, rel_path, line):
+        self.load_file(self.workspace.absolute_path(rel_path), line)
 
     def update_preview(self):
-        md_text = self.editor.toPlainText()
-        import markdown2
-        html = markdown2.markdown(md_text)
-        import re
-        # Strikethrough: ~~text~~ -> <s>text</s>
-        html = re.sub(r'~~(.*?)~~', r'<s>\1</s>', html, flags=re.DOTALL)
-        # Highlight: ==text== -> <mark>text</mark>
-        html = re.sub(r'==([^=\n][^=]*?)==', r'<mark>\1</mark>', html, flags=re.DOTALL)
-        # Inject CSS for <mark> and resizable images
-        html = '''<style>\nmark { background-color: yellow; color: black; }\nimg.resizable {\n  resize: both;\n  overflow: auto;\n  max-width: 100%;\n  max-height: 100%;\n  min-width: 20px;\n  min-height: 20px;\n  display: inline-block;\n}\n</style>''' + html
-        # Add resizable class to all <img> tags
-        html = re.sub(r'<img ', '<img class="resizable" ', html)
-        self.preview.setHtml(html)
+        if self._loading_file:
+            return
+        if TRACER.enabled and self._keystroke_started is None:
+            self._keystroke_started = time.perf_counter()
+        self.preview_scheduler.request()
+
+    def preview_source(self):
+        document = self.editor.document()
+        if document.characterCount() < self.PREVIEW_VIRTUAL_THRESHOLD:
+            self._preview_window = None
+            # Anchored from line 0 as well, for jumps to a line
+            with TRACER.span('toPlainText'):
+                return self.editor.toPlainText(), 0
+        # Only the lines around the viewport are read, never the whole document
+        with TRACER.span('preview_window'):
+            return self.preview_window_source(document)
+
+    def preview_window_source(self, document):
+        top, bottom = self.visible_lines()
+        margin = self.PREVIEW_WINDOW_MARGIN
+        block = document.findBlockByNumber(max(0, top - margin))
+        start = block.blockNumber()
+        # Widen to a blank line so no Markdown block is cut in half
+        while start > 0 and top - start < 2 * margin and block.previous().text().strip():
+            block = block.previous()
+            start -= 1
+        lines = []
+        first_line = start
+        # A blank line inside a fenced code block is no place to start, the
+        # rest of the code would render as Markdown
+        index = self.heading_index()
+        fenced = index.fenced_block(start)
+        if fenced is not None and fenced[0] < start:
+            if top - fenced[0] <= 2 * margin:
+                start = first_line = fenced[0]
+                block = document.findBlockByNumber(start)
+            else:
+                # A long code block, reopen it with its fence instead of rendering it all
+                lines.append(document.findBlockByNumber(fenced[0]).text())
+                first_line = start - 1
+        line = start
+        while block.isValid():
+            text = block.text()
+            if line > bottom + margin and (not text.strip() or line > bottom + 2 * margin):
+                break
+            lines.append(text)
+            block = block.next()
+            line += 1
+        fenced = index.fenced_block(line - 1)
+        if fenced is not None and fenced[1] is not None and fenced[1] >= line:
+            # Cut off inside a code block, close it the way it was opened
+            lines.append(FENCE_RE.match(document.findBlockByNumber(fenced[0]).text()).group(1))
+        self._preview_window = (start, line - 1)
+        return '\n'.join(lines), first_line
+
+    def render_preview(self, source):
+        md_text, first_line = source
+        with TRACER.span('render', chars=len(md_text)):
+            return self.block_renderer.render(md_text, first_line)
+
+    def visible_lines(self):
+        # Hit tests inside the document margin land on arbitrary blocks, stay clear of it
+        inset = int(self.editor.document().documentMargin()) + 1
+        height = self.editor.viewport().height()
+        top = self.editor.cursorForPosition(QPoint(inset, inset)).blockNumber()
+        bottom = self.editor.cursorForPosition(QPoint(inset, max(inset, height - inset))).blockNumber()
+        return top, max(top, bottom)
+
+    def on_editor_scrolled(self):
+        if self._preview_window is None:
+            return
+        top, bottom = self.visible_lines()
+        start, end = self._preview_window
+        slack = self.PREVIEW_WINDOW_MARGIN // 2
+        last_line = self.editor.document().blockCount() - 1
+        if (start > 0 and top - start < slack) or (end < last_line and end - bottom < slack):
+            # Nearing the edge of what is rendered, move the window along
+            self.preview_scheduler.request()
+        else:
+            self.sync_preview_scroll()
+
+    def sync_preview_scroll(self):
+        top, _ = self.visible_lines()
+        self.scroll_preview_to_line(top)
+
+    def scroll_preview_to_line(self, line):
+        # To the anchor of the block the line belongs to
+        i = bisect.bisect_right(self._preview_anchors, line) - 1
+        if i >= 0:
+            self.preview.scrollToAnchor(f"L{self._preview_anchors[i]}")
+
+    def set_preview_html(self, html):
+        if self._preview_window is not None:
+            with TRACER.span('setHtml', chars=len(html)):
+                self.preview.setHtml(html)
+            self._preview_anchors = [int(n) for n in LINE_ANCHOR_RE.findall(html)]
+            self.sync_preview_scroll()
+        else:
+            # Keep the reader's place instead of jumping to the top on every render
+            scrollbar = self.preview.verticalScrollBar()
+            pos = scrollbar.value() if self._restore_preview_scroll is None else self._restore_preview_scroll
+            with TRACER.span('setHtml', chars=len(html)):
+                self.preview.setHtml(html)
+            scrollbar.setValue(pos)
+            self._preview_anchors = [int(n) for n in LINE_ANCHOR_RE.findall(html)]
+        self._restore_preview_scroll = None
+        if self._keystroke_started is not None:
+            TRACER.record('keystroke_to_preview', self._keystroke_started, time.perf_counter())
+            self._keystroke_started = None
+
+    def toggle_latency_hud(self, enabled):
+        TRACER.enable(enabled)
+        self._keystroke_started = None
+        self.latency_label.setVisible(enabled)
+        if enabled:
+            self.update_latency_hud()
+            self._latency_timer.start(self.LATENCY_HUD_MS)
+        else:
+            self._latency_timer.stop()
+
+    def update_latency_hud(self):
+        def ms(seconds):
+            return "-" if seconds is None else f"{seconds * 1000:.0f} ms"
+        render_p50, render_p95 = TRACER.percentiles('render', 50, 95)
+        _, keystroke_p95 = TRACER.percentiles('keystroke_to_preview', 50, 95)
+        chars = self.editor.document().characterCount() - 1
+        self.latency_label.setText(
+            f"Render p50 {ms(render_p50)}  p95 {ms(render_p95)}  |  Keystroke p95 {ms(keystroke_p95)}  |  {chars:,} chars")
+
+    def export_latency_trace(self):
+        from PyQt5.QtWidgets import QMessageBox
+        if not TRACER.events:
+            QMessageBox.information(self, "Export Latency Trace", "Nothing recorded yet, turn on View > Latency HUD first.")
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Export Latency Trace", "trace.json", "Trace Files (*.json)")
+        if not file_name:
+            return
+        try:
+            TRACER.export_chrome_trace(file_name)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Latency Trace", f"Failed to write {file_name}:\n{e}")
+            return
+        self.statusBar().showMessage(f"Trace written to {file_name}, open it in chrome://tracing", 5000)
 
     def insert_underline(self):
         cursor = self.editor.textCursor()
@@ -452,7 +2011,29 @@ class MarkdownEditor(QMainWindow):
             self.editor.setTextCursor(cursor)
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
+    startup_profile.mark("QApplication")
+    # Listen before building the window so a launch in the meantime queues up instead of starting a second editor
+    instance_server = launcher.InstanceServer()
+    instance_server.listen()
     window = MarkdownEditor()
+    startup_profile.mark("MarkdownEditor window")
+    instance_server.files_received.connect(window.open_files)
     window.show()
+    if launch_options.files:
+        # After the autosave recovery prompt queued by the window
+        QTimer.singleShot(0, partial(window.open_files, launch_options.files))
+    if startup_profile.enabled:
+        def first_preview(html):
+            window.preview_scheduler.rendered.disconnect(first_preview)
+            startup_profile.mark("first preview rendered")
+            startup_profile.report()
+
+        def first_pass():
+            startup_profile.mark("first event loop pass")
+            if launch_options.files:
+                window.preview_scheduler.rendered.connect(first_preview)
+            else:
+                startup_profile.report()
+        QTimer.singleShot(0, first_pass)
     sys.exit(app.exec_())
@@ -0,0 +1,359 @@
+"""Markdown syntax highlighting for the source editor.
+
+MarkdownHighlighter keeps one state per block: plain Markdown, inside an HTML
+comment, or inside a fenced code block together with its fence, so that only
+a matching fence closes it. QSyntaxHighlighter rehighlights the blocks an
+edit touched and carries on past them only while the following blocks' state
+changes, so a keystroke costs a line or two; typing a fence or a comment
+opener restyles the blocks it captures, up to the next fence or ``-->``.
+Block patterns are the ones mdrender and mdtable split and render with.
+
+A first pass over a whole document costs about half a second per million
+characters. ViewportHighlighter applies the same rules to the blocks on
+screen only, and works out the state they start in from the text above them,
+which it runs the rules on only for lines with a fence or comment marker.
+"""
+import re
+
+from PyQt5.QtCore import QEvent, QObject, QPoint
+from PyQt5.QtGui import QColor, QFont, QSyntaxHighlighter, QTextCharFormat, QTextCursor, QTextLayout
+
+from mdrender import FENCE_RE, HEADING_RE, LINK_DEF_RE, LIST_ITEM_RE, closes_fence
+from mdtable import CELL_SPLIT_RE, DELIMITER_ROW_RE
+
+# Block states. A fenced code block stores its fence as
+# FENCE_STATE + 2 * length, plus one for a ~~~ fence
+STATE_NORMAL = 0
+STATE_COMMENT = 1
+FENCE_STATE = 2
+
+QUOTE_RE = re.compile(r'^ {0,3}(?:>[ \t]?)+')
+TASK_RE = re.compile(r'\[[ xX]\][ \t]')
+RULE_RE = re.compile(r'^ {0,3}(?:(?:-[ \t]*){3,}|(?:\*[ \t]*){3,}|(?:_[ \t]*){3,})$')
+# Inline spans, scanned once per line. As in mdrender's STRIP_TOKEN_RE every
+# branch starts with a literal character so plain text is skipped without
+# trying each branch. Spans whose content is taken verbatim (comments, code,
+# URLs) come before the emphasis markers that would otherwise match inside
+# them; _ inside a word (snake_case) is not emphasis.
+INLINE_TOKEN_RE = re.compile(
+    r'<(?P<comment>!--.*?(?:-->|$))'
+    r'|<(?P<url>(?:https?|ftp|mailto):[^>\s]+>)'
+    r'|<(?P<tag>/?[A-Za-z][^>]*>)'
+    r'|`(?P<code>`.+?``|[^`]+`)'
+    r'|!(?P<image>\[[^\]]*\]\([^)]*\))'
+    r'|\[(?P<link>[^\]]+\](?:\([^)]*\)|\[[^\]]*\]))'
+    r'|h(?P<bare_url>ttps?://[^\s<>()\[\]|`]+)'
+    r'|\*(?P<strong>\*(?=\S).+?(?<=\S)\*\*)'
+    r'|_(?<!\w_)(?P<underscore_strong>_(?=\S).+?(?<=\S)__(?!\w))'
+    r'|\*(?P<emphasis>(?=[^\s*]).*?(?<=[^\s*])\*)'
+    r'|_(?<!\w_)(?P<underscore_emphasis>(?=[^\s_]).*?(?<=[^\s_])_(?!\w))'
+    r'|~(?P<strike>~.*?~~)'
+    r'|=(?P<highlight>=[^=\n][^=]*?==)')
+# Tokens styled like another one
+TOKEN_FORMATS = {'bare_url': 'url', 'underscore_strong': 'strong', 'underscore_emphasis': 'emphasis'}
+
+
+def fence_state(fence):
+    return FENCE_STATE + 2 * len(fence) + (fence[0] == '~')
+
+
+def state_fence(state):
+    """The fence of a code block state, None for any other state."""
+    if state < FENCE_STATE:
+        return None
+    length, tilde = divmod(state - FENCE_STATE, 2)
+    return ('~' if tilde else '`') * length
+
+
+def _format(color=None, background=None, bold=False, italic=False, strike=False, underline=False, fixed=False):
+    fmt = QTextCharFormat()
+    if color:
+        fmt.setForeground(QColor(color))
+    if background:
+        fmt.setBackground(QColor(background))
+    if bold:
+        fmt.setFontWeight(QFont.Bold)
+    if italic:
+        fmt.setFontItalic(True)
+    if strike:
+        fmt.setFontStrikeOut(True)
+    if underline:
+        fmt.setFontUnderline(True)
+    if fixed:
+        fmt.setFontFamily('monospace')
+        fmt.setFontFixedPitch(True)
+    return fmt
+
+
+def markdown_formats():
+    return {
+        'heading': _format('#1f4e9c', bold=True),
+        'quote': _format('#2e7d32'),
+        'marker': _format('#c25400', bold=True),
+        'rule': _format('#8a8a8a', bold=True),
+        'table': _format('#8a8a8a'),
+        'linkdef': _format('#8a8a8a'),
+        'fence': _format('#8a8a8a', background='#f3f3f3', fixed=True),
+        'code': _format('#a0431b', background='#f3f3f3', fixed=True),
+        'comment': _format('#8a8a8a', italic=True),
+        'image': _format('#6a3fa0'),
+        'link': _format('#1565c0', underline=True),
+        'url': _format('#1565c0'),
+        'tag': _format('#6a3fa0'),
+        'strong': _format(bold=True),
+        'emphasis': _format(italic=True),
+        'strike': _format(strike=True),
+        'highlight': _format('black', background='yellow'),
+    }
+
+
+class MarkdownRules:
+    """The block and inline rules, for a class with QSyntaxHighlighter's setFormat and block state methods."""
+
+    def highlightBlock(self, text):
+        formats = self.formats
+        state = self.previousBlockState()
+        fence = state_fence(state)
+        if fence is not None:
+            if closes_fence(text, fence):
+                self.setFormat(0, len(text), formats['fence'])
+                self.setCurrentBlockState(STATE_NORMAL)
+            else:
+                self.setFormat(0, len(text), formats['code'])
+                self.setCurrentBlockState(state)
+            return
+        self.setCurrentBlockState(STATE_NORMAL)
+        start = 0
+        if state == STATE_COMMENT:
+            end = text.find('-->')
+            if end < 0:
+                self.setFormat(0, len(text), formats['comment'])
+                self.setCurrentBlockState(STATE_COMMENT)
+                return
+            start = end + 3
+            self.setFormat(0, start, formats['comment'])
+        elif text:
+            start = self.highlight_line_start(text)
+            if start is None:
+                return
+        if start < len(text):
+            self.highlight_inline(text, start)
+
+    def highlight_line_start(self, text):
+        """Style the block-level markup at the start of ``text``; returns where inline spans start, None for none."""
+        formats = self.formats
+        first = text.lstrip()[:1]
+        if first in ('`', '~'):
+            m = FENCE_RE.match(text)
+            if m:
+                self.setFormat(0, len(text), formats['fence'])
+                self.setCurrentBlockState(fence_state(m.group(1)))
+                return None
+        elif first == '#':
+            m = HEADING_RE.match(text)
+            if m:
+                self.setFormat(0, len(text), formats['heading'])
+                return None
+        elif first == '[':
+            if LINK_DEF_RE.match(text):
+                self.setFormat(0, len(text), formats['linkdef'])
+                return None
+        if first in ('-', '*', '_') and RULE_RE.match(text):
+            self.setFormat(0, len(text), formats['rule'])
+            return None
+        start = 0
+        m = QUOTE_RE.match(text) if first == '>' else None
+        if m:
+            self.setFormat(0, len(text), formats['quote'])
+            start = m.end()
+        # Anchored at the start of the string, so a quoted item is matched on the rest of the line
+        m = LIST_ITEM_RE.match(text[start:] if start else text)
+        if m:
+            self.setFormat(start, m.end(), formats['marker'])
+            start += m.end()
+            task = TASK_RE.match(text, start)
+            if task:
+                self.setFormat(start, 3, formats['marker'])
+                start = task.end()
+        if '|' in text:
+            if DELIMITER_ROW_RE.match(text):
+                self.setFormat(0, len(text), formats['table'])
+                return None
+            for pipe in CELL_SPLIT_RE.finditer(text, start):
+                self.setFormat(pipe.start(), 1, formats['table'])
+        return start
+
+    def highlight_inline(self, text, start):
+        formats = self.formats
+        for m in INLINE_TOKEN_RE.finditer(text, start):
+            kind = m.lastgroup
+            self.setFormat(m.start(), m.end() - m.start(), formats[TOKEN_FORMATS.get(kind, kind)])
+            if kind == 'comment' and not m.group().endswith('-->'):
+                # Runs on into the next blocks
+                self.setCurrentBlockState(STATE_COMMENT)
+
+
+class MarkdownHighlighter(MarkdownRules, QSyntaxHighlighter):
+    """Highlights Markdown source one block at a time; see the module docstring."""
+
+    def __init__(self, document):
+        super().__init__(document)
+        self.formats = markdown_formats()
+
+
+class ViewportHighlighter(MarkdownRules, QObject):
+    """Highlights the blocks of ``document`` around what ``editor`` shows, before they are painted.
+
+    Every restyle relayouts the rest of a QTextEdit document, so blocks are
+    styled a window at a time, MARGIN_BLOCKS past each edge of the viewport,
+    and again only once the viewport leaves the window. Edits restyle the
+    blocks they touched from contentsChange, where Qt lays them out together
+    with the edit. ``_states`` holds the state each block ends in, from the
+    first block up to the last one that was needed.
+    """
+    MARGIN_BLOCKS = 200
+
+    def __init__(self, document, editor):
+        super().__init__(document)
+        self.formats = markdown_formats()
+        self.editor = editor
+        self._document = document
+        self._states = []
+        self._block_count = document.blockCount()
+        self._spans = []
+        self._previous = self._state = STATE_NORMAL
+        # Styled before the editor first lays the document out, which then costs nothing more
+        self._window = (0, min(self._block_count - 1, 2 * self.MARGIN_BLOCKS))
+        self.style_blocks(*self._window)
+        # Created now, the layout reports the whole document as inserted before anything listens
+        document.documentLayout()
+        document.contentsChange.connect(self.on_contents_change)
+        editor.viewport().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self.editor.document() is self._document:
+            first, last = self.visible_blocks()
+            if first < self._window[0] or last > self._window[1]:
+                self._window = (max(0, first - self.MARGIN_BLOCKS), min(self._block_count - 1, last + self.MARGIN_BLOCKS))
+                self.style_blocks(*self._window)
+        return False
+
+    # What MarkdownRules calls on a QSyntaxHighlighter
+
+    def previousBlockState(self):
+        return self._previous
+
+    def setCurrentBlockState(self, state):
+        self._state = state
+
+    def setFormat(self, start, count, fmt):
+        # Replaces what the characters had, as QSyntaxHighlighter does
+        end = start + count
+        spans = []
+        for span in self._spans:
+            if span[1] <= start or span[0] >= end:
+                spans.append(span)
+                continue
+            if span[0] < start:
+                spans.append((span[0], start, span[2]))
+            if span[1] > end:
+                spans.append((end, span[1], span[2]))
+        if count > 0:
+            spans.append((start, end, fmt))
+        self._spans = spans
+
+    def style(self, state, text):
+        """The state a block holding ``text`` ends in when it starts in ``state``; its formats are left in _spans."""
+        self._previous = state
+        self._state = STATE_NORMAL
+        self._spans = []
+        self.highlightBlock(text)
+        return self._state
+
+    def format_ranges(self):
+        ranges = []
+        for start, end, fmt in sorted(self._spans, key=lambda span: span[0]):
+            if ranges and ranges[-1].start + ranges[-1].length == start and ranges[-1].format == fmt:
+                ranges[-1].length += end - start
+                continue
+            r = QTextLayout.FormatRange()
+            r.start = start
+            r.length = end - start
+            r.format = fmt
+            ranges.append(r)
+        return ranges
+
+    def on_contents_change(self, position, removed, added):
+        document = self._document
+        count = document.blockCount()
+        shift = count - self._block_count
+        self._block_count = count
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(min(position + added, document.characterCount() - 1)).blockNumber()
+        top, bottom = self._window
+        if first < top:
+            top = max(first, top + shift)
+        if first <= bottom:
+            bottom = max(top, min(count - 1, bottom + shift))
+        self._window = (top, bottom)
+        if first < len(self._states):
+            # The blocks below keep their states when the edited ones end in the state they ended in before
+            old_last = last - shift
+            end = self._states[old_last] if old_last < len(self._states) else None
+            tail = self._states[old_last + 1:]
+            del self._states[first:]
+            self.extend_states(last)
+            if self._states[last] == end:
+                self._states.extend(tail)
+                bottom = min(bottom, last)
+        if first <= bottom:
+            self.style_blocks(max(first, top), bottom)
+
+    def extend_states(self, last):
+        """Work out the states of the blocks up to number ``last``."""
+        states = self._states
+        if last < len(states):
+            return
+        document = self._document
+        cursor = QTextCursor(document)
+        cursor.setPosition(document.findBlockByNumber(len(states)).position())
+        block = document.findBlockByNumber(last)
+        cursor.setPosition(block.position() + block.length() - 1, QTextCursor.KeepAnchor)
+        state = states[-1] if states else STATE_NORMAL
+        for text in cursor.selectedText().split('\u2029'):
+            # No other line can open or close a fence or comment
+            if '<!--' in text or '-->' in text or text.lstrip()[:1] in ('`', '~'):
+                state = self.style(state, text)
+            states.append(state)
+
+    def visible_blocks(self):
+        editor = self.editor
+        # Hit tests inside the document margin land on arbitrary blocks, stay clear of it
+        inset = int(self._document.documentMargin()) + 1
+        height = editor.viewport().height()
+        top = editor.cursorForPosition(QPoint(inset, inset)).blockNumber()
+        bottom = editor.cursorForPosition(QPoint(inset, max(inset, height - inset))).blockNumber()
+        return top, max(top, bottom)
+
+    def style_blocks(self, first, last):
+        """Restyle the blocks numbered ``first`` to ``last`` whose formats changed, with a single relayout."""
+        document = self._document
+        states = self._states
+        self.extend_states(first - 1)
+        state = states[first - 1] if first else STATE_NORMAL
+        start = end = None
+        block = document.findBlockByNumber(first)
+        while block.isValid() and block.blockNumber() <= last:
+            state = self.style(state, block.text())
+            if block.blockNumber() == len(states):
+                states.append(state)
+            layout = block.layout()
+            ranges = self.format_ranges()
+            if layout.formats() != ranges:
+                layout.setFormats(ranges)
+                if start is None:
+                    start = block.position()
+                end = block.position() + block.length()
+            block = block.next()
+        if start is not None:
+            document.markContentsDirty(start, end - start)
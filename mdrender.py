@@ -0,0 +1,258 @@
+"""Markdown to HTML rendering shared by the editor preview and the batch CLI.
+
+Nothing in here imports Qt, so it can be used from scripts and worker
+processes without a display.
+"""
+import re
+import threading
+
+from latency import TRACER
+
+# Bump when the generated HTML changes so batch outputs get rebuilt
+RENDER_VERSION = 1
+
+# Inject CSS for <mark> and resizable images
+PREVIEW_CSS = '''<style>\nmark { background-color: yellow; color: black; }\nimg.resizable {\n  resize: both;\n  overflow: auto;\n  max-width: 100%;\n  max-height: 100%;\n  min-width: 20px;\n  min-height: 20px;\n  display: inline-block;\n}\n</style>'''
+
+# Strikethrough: ~~text~~ -> <s>text</s>
+STRIKE_RE = re.compile(r'~~(.*?)~~', re.DOTALL)
+# Highlight: ==text== -> <mark>text</mark>
+HIGHLIGHT_RE = re.compile(r'==([^=\n][^=]*?)==', re.DOTALL)
+IMG_TAG_RE = re.compile(r'<img ')
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+ATX_HEADING_RE = re.compile(r'^ {0,3}#{1,6}(?:[ \t]|$)')
+HEADING_RE = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$')
+LIST_ITEM_RE = re.compile(r'^ {0,3}(?:[-*+]|\d+\.)[ \t]')
+LINK_DEF_RE = re.compile(r'^ {0,3}\[([^\]]+)\]:.*$', re.MULTILINE)
+LINK_LABEL_RE = re.compile(r'\[([^\]]+)\]')
+# Marks the source line a preview fragment starts at, see BlockRenderer.render
+LINE_ANCHOR_RE = re.compile(r'<a name="L(\d+)"></a>')
+HTML_BLOCK_RE = re.compile(r'^<(div|table|pre|p|ul|ol|dl|blockquote|form|h[1-6]|iframe|script|noscript|math|ins|del)\b', re.IGNORECASE)
+
+
+def postprocess_html(html):
+    html = STRIKE_RE.sub(r'<s>\1</s>', html)
+    html = HIGHLIGHT_RE.sub(r'<mark>\1</mark>', html)
+    # Add resizable class to all <img> tags
+    return IMG_TAG_RE.sub('<img class="resizable" ', html)
+
+
+def _markdown(md_text):
+    # Imported on first use, markdown2 is the slowest import on the editor's start-up path
+    import markdown2
+    return markdown2.markdown(md_text)
+
+
+def render_fragment(md_text):
+    return postprocess_html(_markdown(md_text))
+
+
+def render_html(md_text):
+    return PREVIEW_CSS + render_fragment(md_text)
+
+
+def split_blocks(md_text, with_lines=False):
+    """Split Markdown source into top-level blocks that render independently.
+
+    A new block starts at a heading or after a blank line, except where
+    markdown2 would join the chunks anyway: fences, HTML blocks and comments
+    left open, indented continuations and further items of a list.
+    With ``with_lines`` each block comes as ``(first_line, text)``.
+    """
+    blocks = []
+    current = []
+    start = 0
+    closer = None
+    after_blank = False
+    in_list = False
+    for lineno, line in enumerate(md_text.split('\n')):
+        if closer is not None:
+            current.append(line)
+            if closer(line):
+                closer = None
+            continue
+        if not line.strip():
+            if current:
+                current.append(line)
+                after_blank = True
+            continue
+        starts_block = ATX_HEADING_RE.match(line) or (
+            after_blank and not line[:1].isspace()
+            and not (in_list and LIST_ITEM_RE.match(line))
+        )
+        if starts_block and current:
+            blocks.append((start, '\n'.join(current)))
+            current = []
+        if not current:
+            start = lineno
+            in_list = bool(LIST_ITEM_RE.match(line))
+        current.append(line)
+        after_blank = False
+        fence = FENCE_RE.match(line)
+        html_block = HTML_BLOCK_RE.match(line)
+        if fence:
+            # Closed by a run of the same character at least as long
+            marker = fence.group(1)
+            closer = lambda l, m=marker: l.strip().startswith(m) and not l.strip().strip(m[0])
+        elif '<!--' in line and '-->' not in line[line.index('<!--'):]:
+            closer = lambda l: '-->' in l
+        elif html_block and '</' + html_block.group(1).lower() not in line.lower():
+            end_tag = '</' + html_block.group(1).lower()
+            closer = lambda l, t=end_tag: l.lower().lstrip().startswith(t)
+    if current:
+        blocks.append((start, '\n'.join(current)))
+    if with_lines:
+        return blocks
+    return [text for _, text in blocks]
+
+
+class BlockRenderer:
+    """Renders Markdown block by block, reusing HTML for unchanged blocks.
+
+    Reference-style link definitions may live anywhere in the document, so
+    each block is rendered together with the definitions it refers to and
+    those definitions are part of its cache key.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def render(self, md_text, first_line=None):
+        """Render ``md_text`` to preview HTML.
+
+        When ``first_line`` is given, ``md_text`` is a slice of a larger
+        document starting at that line and every fragment is preceded by an
+        ``<a name="L<line>">`` anchor for scroll syncing.
+        """
+        with self._lock:
+            definitions = {}
+            for m in LINK_DEF_RE.finditer(md_text):
+                definitions.setdefault(m.group(1).lower(), m.group(0).strip())
+            cache = {}
+            fragments = []
+            for lineno, block in split_blocks(md_text, with_lines=True):
+                if definitions:
+                    labels = dict.fromkeys(l.lower() for l in LINK_LABEL_RE.findall(block))
+                    refs = [definitions[l] for l in labels if l in definitions and definitions[l] not in block]
+                    if refs:
+                        block = block + '\n\n' + '\n'.join(refs)
+                html = self._cache.get(block, cache.get(block))
+                if html is None:
+                    if LINK_DEF_RE.sub('', block).strip():
+                        with TRACER.span('markdown2', chars=len(block)):
+                            html = _markdown(block)
+                        with TRACER.span('postprocess'):
+                            html = postprocess_html(html)
+                    else:
+                        # Definitions only; markdown2 would emit an empty <p>
+                        html = ''
+                cache[block] = html
+                if first_line is not None:
+                    fragments.append(f'<a name="L{first_line + lineno}"></a>')
+                fragments.append(html)
+            # Only blocks present in the current document are kept
+            self._cache = cache
+            return PREVIEW_CSS + ''.join(fragments)
+
+    def clear(self):
+        with self._lock:
+            self._cache = {}
+
+
+# Pieces of STRIP_TOKEN_RE. Whole lines that vanish (fences, rules, comment-
+# or tag-only lines) take their newline with them, and a line's block
+# markers are consumed together with the newline in front of it.
+_STRIP_FENCE = r'[ \t]*(?:`{3,}[^\n]*(?:\n[\s\S]*?(?:\n[ \t]*`{3,}[ \t]*(?=\n|\Z))|[\s\S]*)|~{3,}[^\n]*(?:\n[\s\S]*?(?:\n[ \t]*~{3,}[ \t]*(?=\n|\Z))|[\s\S]*))\n?'
+_STRIP_RULE = r'[ \t]*\|?[ \t]*(?::?-+:?|\*{3,}|_{3,})[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*(?:\n|\Z)'
+_STRIP_HTML_LINE = r'[ \t]*(?:(?:<!--[\s\S]*?-->|</?[A-Za-z][^>\n]*>)[ \t]*)+(?:\n|\Z)'
+_STRIP_PREFIX = r'[ \t]*(?:>[ \t]*)*(?:\|[ \t]*)?(?:#{1,6}(?=[ \t\n]|\Z)[ \t]*|(?:[-*+]|\d+[.)])[ \t]+(?:\[[ xX]\][ \t]+)?)?'
+
+# One alternation scanned once over the text by strip_markdown. Every branch
+# starts with a literal character so the regex engine can skip plain text
+# without trying each branch. Spans whose content is kept verbatim (code,
+# URLs) come before the emphasis delimiters that would otherwise eat their
+# underscores and asterisks. A delimiter with whitespace on both sides stays
+# (5 * 3, a == b), as does _ or == inside a word (snake_case, a==b).
+# Link, image and tag spans stop at the end of the line and at the next
+# opener of their own kind, so a run of unclosed ones is scanned once
+# rather than to the end of the text from each opener.
+STRIP_TOKEN_RE = re.compile(
+    r'\n(?=[ \t\n>|#*+\-\d`~<:_])(?P<newline>)'
+    r'(?:[ \t]*\n|' + _STRIP_FENCE + '|' + _STRIP_RULE + '|' + _STRIP_HTML_LINE + ')*' + _STRIP_PREFIX +
+    r'| [ \t]*(?:\|[ \t]*)?(?=\n|\Z)|\t[ \t]*(?:\|[ \t]*)?(?=\n|\Z)'
+    r'|<!--[\s\S]*?(?:-->|\Z)'
+    r'|``(?P<code2>[\s\S]*?[^`])``(?!`)|`(?P<code>[^`]+)`'
+    r'|!\[(?P<alt>[^\[\]\n]*)\]\([^()\n]*\)'
+    r'|\[(?P<link>[^\[\]\n]+)\](?:\([^()\n]*\)|\[[^\[\]\n]*\])'
+    r'|<(?P<autolink>(?:https?|ftp|mailto):[^>\s]+)>'
+    r'|</?[A-Za-z][^<>\n]*>'
+    r'|h(?P<url>ttps?://[^\s<>()\[\]|`]+)'
+    r'|\\(?P<escaped>[!-/:-@\[-`{-~])'
+    r'|\*(?<![\s*]\*)\**|\*+(?![\s*])'
+    r'|_(?<!\w_)_*(?![_\s])|_(?<![\s_]_)_*(?!\w)'
+    r'|~~(?<![\s~]~~)|~~(?![\s~])'
+    r'|==(?<![\w=]==)(?![=\s])|==(?<![\s=]==)(?![\w=])'
+    r'|\|[ \t]*',
+    re.MULTILINE)
+
+
+def _strip_token(m):
+    kind = m.lastgroup
+    if kind is None:
+        return ''
+    if kind == 'newline':
+        return '\n'
+    if kind == 'url':
+        return 'h' + m.group(kind)
+    return m.group(kind)
+
+
+def strip_markdown(text):
+    """Convert Markdown to plain text in a single scan.
+
+    Drops fenced code blocks, comments, HTML tags, table rules and block
+    markers (headings, quotes, list bullets, checkboxes); keeps the text of
+    links, images and inline code; removes emphasis, ~~strike~~ and
+    ==highlight== markers; collapses blank lines.
+    """
+    # The leading newline lets the first line's block markers match like any other
+    return STRIP_TOKEN_RE.sub(_strip_token, '\n' + text).strip()
+
+
+def closes_fence(line, fence):
+    """Whether ``line`` closes a code block opened by ``fence``: a run of the same character at least as long."""
+    m = FENCE_RE.match(line)
+    return bool(m) and m.group(1)[0] == fence[0] and len(m.group(1)) >= len(fence) and not line.strip().strip(fence[0])
+
+
+def split_sections(md_text, level=2):
+    """Return ``(title, body)`` for every heading of ``level`` outside code fences.
+
+    A section runs until the next heading of the same or a higher level;
+    text before the first such heading is not part of any section.
+    """
+    sections = []
+    title = None
+    body = []
+    fence = None
+    for line in md_text.split('\n'):
+        m = FENCE_RE.match(line)
+        if fence is not None:
+            if closes_fence(line, fence):
+                fence = None
+        elif m:
+            fence = m.group(1)
+        else:
+            heading = HEADING_RE.match(line)
+            if heading and len(heading.group(1)) <= level:
+                if title is not None:
+                    sections.append((title, '\n'.join(body).strip('\n')))
+                title = (heading.group(2) or '').strip() if len(heading.group(1)) == level else None
+                body = []
+                continue
+        if title is not None:
+            body.append(line)
+    if title is not None:
+        sections.append((title, '\n'.join(body).strip('\n')))
+    return sections
@@ -0,0 +1,204 @@
+"""GitHub-flavoured Markdown tables held column by column.
+
+Backs the grid table editor: CSV/TSV files are streamed into a TableData,
+tables already in the document are parsed from their lines, and
+``write_table`` emits Markdown a chunk of rows at a time instead of building
+every formatted row up front. No Qt dependency.
+"""
+import csv
+import io
+import itertools
+import re
+
+# | :--- | ---: | :-: |, outer pipes optional
+DELIMITER_ROW_RE = re.compile(r'^[ \t]*\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$')
+# Cell boundaries, \| is a literal pipe inside a cell
+CELL_SPLIT_RE = re.compile(r'(?<!\\)\|')
+WRITE_CHUNK_ROWS = 1000
+
+
+class TableData:
+    """Headers, per-column alignment and one list of cell strings per column."""
+
+    def __init__(self, headers, columns=None, alignments=None):
+        self.headers = list(headers)
+        self.columns = columns if columns is not None else [[] for _ in self.headers]
+        self.alignments = list(alignments) if alignments else [None] * len(self.headers)
+
+    @classmethod
+    def blank(cls, rows, cols):
+        headers = [f"Header {c+1}" for c in range(cols)]
+        columns = [[f"Cell {r+1},{c+1}" for r in range(rows)] for c in range(cols)]
+        return cls(headers, columns)
+
+    @property
+    def row_count(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    @property
+    def column_count(self):
+        return len(self.columns)
+
+    def cell(self, row, column):
+        return self.columns[column][row]
+
+    def set_cell(self, row, column, value):
+        self.columns[column][row] = value
+
+    def row(self, row):
+        return [column[row] for column in self.columns]
+
+    def append_row(self, values):
+        """Append one row; short rows are padded and extra cells dropped, as GFM does."""
+        width = len(self.columns)
+        if len(values) != width:
+            values = (list(values) + [''] * width)[:width]
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+    def insert_rows(self, row, count):
+        for column in self.columns:
+            column[row:row] = [''] * count
+
+    def remove_rows(self, row, count):
+        for column in self.columns:
+            del column[row:row + count]
+
+    def insert_columns(self, column, count):
+        rows = self.row_count
+        self.columns[column:column] = [[''] * rows for _ in range(count)]
+        self.headers[column:column] = [f"Header {column+i+1}" for i in range(count)]
+        self.alignments[column:column] = [None] * count
+
+    def remove_columns(self, column, count):
+        del self.columns[column:column + count]
+        del self.headers[column:column + count]
+        del self.alignments[column:column + count]
+
+
+def sniff_delimiter(line):
+    if '\t' in line:
+        return '\t'
+    return ';' if line.count(';') > line.count(',') else ','
+
+
+def read_delimited(f, delimiter=None, has_header=True):
+    """Stream a CSV/TSV text file into a TableData.
+
+    ``f`` should be opened with ``newline=''``. The delimiter is guessed from
+    the first line when not given; without a header row the columns are named
+    ``Column 1``, ``Column 2``...
+    """
+    lines = f
+    if delimiter is None:
+        first = f.readline()
+        delimiter = sniff_delimiter(first)
+        lines = itertools.chain([first], f)
+    reader = csv.reader(lines, delimiter=delimiter)
+    first_row = next(reader, None)
+    if first_row is None:
+        return TableData([])
+    if has_header:
+        table = TableData(first_row)
+    else:
+        table = TableData([f"Column {c+1}" for c in range(len(first_row))])
+        table.append_row(first_row)
+    append = table.append_row
+    for row in reader:
+        if row:
+            append(row)
+    return table
+
+
+def is_table_line(line):
+    return bool(line.strip()) and CELL_SPLIT_RE.search(line) is not None
+
+
+def split_row(line):
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|') and not line.endswith('\\|'):
+        line = line[:-1]
+    return [cell.strip().replace('\\|', '|') for cell in CELL_SPLIT_RE.split(line)]
+
+
+def _alignment(cell):
+    left, right = cell.startswith(':'), cell.endswith(':')
+    if left and right:
+        return 'center'
+    if right:
+        return 'right'
+    return 'left' if left else None
+
+
+def parse_table(lines):
+    """Parse a header row, delimiter row and body rows, or return None."""
+    if len(lines) < 2 or not DELIMITER_ROW_RE.match(lines[1]):
+        return None
+    headers = split_row(lines[0])
+    alignments = [_alignment(cell) for cell in split_row(lines[1])]
+    alignments = (alignments + [None] * len(headers))[:len(headers)]
+    table = TableData(headers, alignments=alignments)
+    for line in lines[2:]:
+        table.append_row(split_row(line))
+    return table
+
+
+def _escape(text):
+    return text.replace('|', '\\|').replace('\r\n', '<br>').replace('\n', '<br>')
+
+
+def _justify(text, width, alignment):
+    if alignment == 'right':
+        return text.rjust(width)
+    if alignment == 'center':
+        return text.center(width)
+    return text.ljust(width)
+
+
+def _delimiter(width, alignment):
+    if alignment == 'center':
+        return ':' + '-' * (width - 2) + ':'
+    if alignment == 'right':
+        return '-' * (width - 1) + ':'
+    if alignment == 'left':
+        return ':' + '-' * (width - 1)
+    return '-' * width
+
+
+def write_table(table, write, pad=True):
+    """Write ``table`` as a GitHub-flavoured Markdown table through ``write``.
+
+    Column widths take one pass over each column; rows are then formatted and
+    handed to ``write`` WRITE_CHUNK_ROWS at a time. With ``pad=False`` cells
+    are not aligned, which keeps very large tables small.
+    """
+    if not table.columns:
+        return
+    headers = [_escape(h) for h in table.headers]
+    alignments = table.alignments
+    if pad:
+        # Measured on the cells as written, escaped pipes and <br> included
+        widths = [max(3, len(h), max((len(_escape(cell)) for cell in column), default=0))
+                  for h, column in zip(headers, table.columns)]
+    else:
+        widths = [3] * len(headers)
+    write('| ' + ' | '.join(_justify(h, w, a) for h, w, a in zip(headers, widths, alignments)) + ' |\n')
+    write('| ' + ' | '.join(_delimiter(w, a) for w, a in zip(widths, alignments)) + ' |\n')
+    layout = list(zip(table.columns, widths, alignments))
+    for start in range(0, table.row_count, WRITE_CHUNK_ROWS):
+        chunk = []
+        for r in range(start, min(start + WRITE_CHUNK_ROWS, table.row_count)):
+            if pad:
+                cells = (_justify(_escape(column[r]), w, a) for column, w, a in layout)
+            else:
+                cells = (_escape(column[r]) for column, w, a in layout)
+            chunk.append('| ' + ' | '.join(cells) + ' |\n')
+        write(''.join(chunk))
+
+
+def format_table(table, pad=True):
+    out = io.StringIO()
+    write_table(table, out.write, pad)
+    return out.getvalue()
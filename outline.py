@@ -0,0 +1,158 @@
+"""Heading outline of one Markdown document, patched line by line as it is edited.
+
+HeadingIndex records the lines that can matter to an outline, ATX headings
+and code fences, by line number. ``replace_lines`` applies an edit to the
+lines it touched and shifts the line numbers after it, so typing never
+rescans the text. Which headings sit inside a fenced code block is worked
+out from the recorded fences when ``headings`` is next asked for, and
+``fenced_block`` answers the same question for any line. ``filter`` narrows
+the outline to fuzzy matches with one regex scan over all titles.
+No Qt dependency.
+"""
+import bisect
+import re
+
+from mdrender import FENCE_RE, HEADING_RE, closes_fence
+
+# Lines that may be a heading or a fence, everything else is skipped without a look.
+# Matched after a newline, a literal the regex engine finds much faster than ^.
+CANDIDATE_RE = re.compile(r'\n( {0,3}[#`~][^\n]*)')
+
+
+def scan_line(line):
+    """``(level, title)`` for a heading, ``(0, line)`` for a fence, None for any other line."""
+    if FENCE_RE.match(line):
+        return 0, line
+    m = HEADING_RE.match(line)
+    if m:
+        return len(m.group(1)), (m.group(2) or '').strip()
+    return None
+
+
+def fuzzy_pattern(query):
+    """A regex matching a line with the characters of ``query`` in order; whitespace and case are ignored.
+
+    Anchored at the start of a line, and each gap skips everything but the
+    next character, so a line that does not match fails in one pass over it
+    instead of backtracking through every way to place the characters.
+    """
+    chars = [re.escape(c) for c in query.lower() if not c.isspace()]
+    gaps = ''.join(f'[^{c}\\n]*{c}' for c in chars)
+    # Runs on to the end of the line so each line matches once
+    return re.compile('^' + gaps + r'[^\n]*', re.MULTILINE)
+
+
+class HeadingIndex:
+    def __init__(self, text=''):
+        self.reset(text)
+
+    def reset(self, text):
+        """Index ``text`` from scratch."""
+        lines = []
+        entries = []
+        line = -1
+        last = 0
+        # The leading newline lets the first line match like any other
+        text = '\n' + text
+        for m in CANDIDATE_RE.finditer(text):
+            line += text.count('\n', last, m.start() + 1)
+            last = m.start() + 1
+            entry = scan_line(m.group(1))
+            if entry is not None:
+                lines.append(line)
+                entries.append(entry)
+        # Line numbers of the recorded lines, ascending, and what each one is
+        self.lines = lines
+        self.entries = entries
+        self.line_count = text.count('\n')
+        self._headings = None
+        self._fences = None
+        self._titles = None
+
+    def replace_lines(self, first, count, new_lines):
+        """Replace ``count`` lines from line ``first`` on with ``new_lines``.
+
+        Returns False, leaving the index untouched, when the range does not
+        fit the indexed text; the caller should ``reset`` then.
+        """
+        if first < 0 or count < 0 or first + count > self.line_count:
+            return False
+        lo = bisect.bisect_left(self.lines, first)
+        hi = bisect.bisect_left(self.lines, first + count)
+        delta = len(new_lines) - count
+        if delta:
+            self.lines[hi:] = [line + delta for line in self.lines[hi:]]
+        lines = []
+        entries = []
+        for offset, text in enumerate(new_lines):
+            entry = scan_line(text) if text.lstrip(' ')[:1] in ('#', '`', '~') else None
+            if entry is not None:
+                lines.append(first + offset)
+                entries.append(entry)
+        changed = hi > lo or entries
+        self.lines[lo:hi] = lines
+        self.entries[lo:hi] = entries
+        self.line_count += delta
+        if changed:
+            self._headings = None
+            self._fences = None
+            self._titles = None
+        elif delta and self._headings is not None:
+            # Same headings and fences, moved
+            self._headings = [(line + delta if line >= first else line, level, title)
+                              for line, level, title in self._headings]
+            self._fences = tuple([line + delta if line is not None and line >= first else line for line in lines]
+                                 for lines in self._fences)
+        return True
+
+    def headings(self):
+        """``(line, level, title)`` of every heading outside fenced code blocks, in document order."""
+        if self._headings is None:
+            headings = []
+            # First and last line of each fenced code block, None for one left open
+            starts = []
+            ends = []
+            fence = None
+            for line, (level, text) in zip(self.lines, self.entries):
+                if fence is not None:
+                    if level == 0 and closes_fence(text, fence):
+                        fence = None
+                        ends[-1] = line
+                elif level == 0:
+                    fence = FENCE_RE.match(text).group(1)
+                    starts.append(line)
+                    ends.append(None)
+                else:
+                    headings.append((line, level, text))
+            self._headings = headings
+            self._fences = (starts, ends)
+        return self._headings
+
+    def fenced_block(self, line):
+        """``(first, last)`` lines of the fenced code block ``line`` is part of, fences included, or None.
+
+        ``last`` is None for a block that is never closed.
+        """
+        self.headings()
+        starts, ends = self._fences
+        i = bisect.bisect_right(starts, line) - 1
+        if i < 0 or (ends[i] is not None and ends[i] < line):
+            return None
+        return starts[i], ends[i]
+
+    def filter(self, query):
+        """The headings whose title contains the characters of ``query`` in order, in document order."""
+        headings = self.headings()
+        if not query.strip():
+            return headings
+        if self._titles is None:
+            titles = [title.lower().replace('\n', ' ') for _, _, title in headings]
+            starts = []
+            offset = 0
+            for title in titles:
+                starts.append(offset)
+                offset += len(title) + 1
+            self._titles = ('\n'.join(titles), starts)
+        blob, starts = self._titles
+        return [headings[bisect.bisect_right(starts, m.start()) - 1]
+                for m in fuzzy_pattern(query).finditer(blob)]
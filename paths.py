@@ -0,0 +1,18 @@
+"""Per-user locations for the editor's persistent data."""
+import os
+import sys
+
+APP_NAME = "MarkdownEditor"
+
+
+def user_config_dir():
+    """Return (and create) the per-user config directory for the editor."""
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,80 @@
+import os
+import stat
+import threading
+
+import pytest
+
+from autosave import AutosaveSession, apply_edits, atomic_write, find_sessions, read_session
+
+
+def test_journal_replays_over_compaction(tmp_path):
+    session = AutosaveSession.create(root=str(tmp_path), source_file='notes.md')
+    session.finish_compaction(0, 'hello')
+    session.record(5, 0, ' world')
+    generation = session.begin_compaction()
+    # Recorded after the compaction began, goes to the new journal
+    session.record(11, 0, '!')
+    assert not os.path.exists(os.path.join(session.path, f'journal.{generation}.log'))
+    assert read_session(session.path) == ('notes.md', 'hello')
+    session.flush()
+    assert read_session(session.path) == ('notes.md', 'hello world!')
+    session.finish_compaction(generation, 'hello world')
+    assert sorted(os.listdir(session.path)) == ['base.1.md', 'journal.1.log', 'session.json']
+    assert read_session(session.path) == ('notes.md', 'hello world!')
+    session.close()
+
+
+def test_discard_turns_away_queued_snapshot(tmp_path):
+    session = AutosaveSession.create(root=str(tmp_path))
+    session.discard()
+    session.finish_compaction(0, 'late')
+    assert not os.path.exists(session.path)
+    assert find_sessions(str(tmp_path)) == []
+
+
+def test_discard_waits_for_snapshot_being_written(tmp_path, monkeypatch):
+    import autosave
+    session = AutosaveSession.create(root=str(tmp_path))
+    writing = threading.Event()
+    release = threading.Event()
+    real_write = autosave.atomic_write
+
+    def slow_write(path, text, newline=''):
+        writing.set()
+        release.wait(5)
+        real_write(path, text, newline)
+
+    monkeypatch.setattr(autosave, 'atomic_write', slow_write)
+    worker = threading.Thread(target=session.finish_compaction, args=(0, 'text'))
+    worker.start()
+    writing.wait(5)
+    discarding = threading.Thread(target=session.discard)
+    discarding.start()
+    release.set()
+    worker.join(5)
+    discarding.join(5)
+    assert not os.path.exists(session.path)
+
+
+def test_apply_edits_counts_utf16_units():
+    assert apply_edits('a\U0001F600b', [[3, 1, 'c']]) == 'a\U0001F600c'
+
+
+def test_atomic_write_keeps_mode(tmp_path):
+    path = tmp_path / 'doc.md'
+    path.write_text('old')
+    os.chmod(path, 0o640)
+    atomic_write(str(path), 'new')
+    assert path.read_text() == 'new'
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink'), reason='needs symlinks')
+def test_atomic_write_follows_symlink(tmp_path):
+    target = tmp_path / 'real.md'
+    target.write_text('old')
+    link = tmp_path / 'link.md'
+    os.symlink(target, link)
+    atomic_write(str(link), 'new')
+    assert os.path.islink(link)
+    assert target.read_text() == 'new'
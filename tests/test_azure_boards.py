@@ -0,0 +1,175 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from azure_boards import BATCH_LIMIT, AzureBoardsClient, AzureBoardsError
+
+
+class StubServer(ThreadingHTTPServer):
+    """Answers each request with the next scripted ``(status, headers, body, delay)``, then 200 ``{}``."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.responses = []
+        self.requests = []
+
+    def reply(self, status=200, body=None, headers=None, delay=0):
+        self.responses.append((status, headers or {}, body if body is not None else {}, delay))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.respond(None)
+
+    def do_POST(self):
+        self.respond(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+
+    def respond(self, body):
+        server = self.server
+        server.requests.append((self.command, self.path, body))
+        if server.responses:
+            status, headers, payload, delay = server.responses.pop(0)
+        else:
+            status, headers, payload, delay = 200, {}, {}, 0
+        if callable(payload):
+            payload = payload(body)
+        time.sleep(delay)
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except OSError:
+            # The client timed out and hung up
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(url, **kwargs):
+    sleeps = []
+    client = AzureBoardsClient(url, 'proj', 'pat', sleep=sleeps.append, **kwargs)
+    return client, sleeps
+
+
+def server_url(server):
+    return 'http://%s:%d' % server.server_address
+
+
+def test_get_retries_5xx(server):
+    server.reply(503)
+    server.reply(502)
+    server.reply(200, {'id': 7})
+    client, sleeps = make_client(server_url(server), backoff=0.5)
+    assert client.get_work_item(7) == {'id': 7}
+    assert len(server.requests) == 3
+    assert sleeps == [0.5, 1.0]
+
+
+def test_post_not_retried_on_5xx(server):
+    server.reply(503)
+    client, sleeps = make_client(server_url(server))
+    with pytest.raises(AzureBoardsError) as info:
+        client.create_task('title', 'description')
+    assert info.value.status == 503
+    assert len(server.requests) == 1
+    assert sleeps == []
+
+
+def test_post_retried_on_429_with_retry_after(server):
+    server.reply(429, headers={'Retry-After': '3'})
+    server.reply(200, {'id': 1})
+    client, sleeps = make_client(server_url(server))
+    assert client.create_task('title', 'description') == {'id': 1}
+    assert len(server.requests) == 2
+    assert sleeps == [3.0]
+
+
+def test_post_not_retried_after_read_timeout(server):
+    server.reply(200, {'id': 1}, delay=1)
+    client, sleeps = make_client(server_url(server), timeout=0.2)
+    with pytest.raises(AzureBoardsError):
+        client.create_task('title', 'description')
+    assert len(server.requests) == 1
+    assert sleeps == []
+
+
+def test_post_retried_when_connection_refused():
+    # Nothing listens on a port that was just released
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    client, sleeps = make_client('http://127.0.0.1:%d' % port, max_retries=2, backoff=0.1)
+    with pytest.raises(AzureBoardsError):
+        client.create_task('title', 'description')
+    assert sleeps == [0.1, 0.2]
+
+
+def batch_result(fail=()):
+    def result(body):
+        value = []
+        for item in body:
+            title = item['body'][0]['value']
+            if title in fail:
+                value.append({'code': 400, 'body': json.dumps({'message': 'bad ' + title})})
+            else:
+                value.append({'code': 200, 'body': json.dumps({'id': int(title)})})
+        return {'count': len(value), 'value': value}
+    return result
+
+
+def test_create_tasks_batches(server):
+    tasks = [(str(n), '') for n in range(BATCH_LIMIT + 5)]
+    server.reply(200, batch_result())
+    server.reply(200, batch_result())
+    client, _ = make_client(server_url(server))
+    created = client.create_tasks(tasks)
+    assert [item['id'] for item in created] == list(range(BATCH_LIMIT + 5))
+    assert [len(body) for _, _, body in server.requests] == [BATCH_LIMIT, 5]
+
+
+def test_create_tasks_failure_keeps_created_ids(server):
+    tasks = [(str(n), '') for n in range(BATCH_LIMIT + 5)]
+    server.reply(200, batch_result())
+    server.reply(200, batch_result(fail={str(BATCH_LIMIT + 1)}))
+    client, _ = make_client(server_url(server))
+    with pytest.raises(AzureBoardsError) as info:
+        client.create_tasks(tasks)
+    ids = [item['id'] for item in info.value.created]
+    assert ids == [n for n in range(BATCH_LIMIT + 5) if n != BATCH_LIMIT + 1]
+    assert info.value.status == 400
+    assert str(BATCH_LIMIT + 4) in str(info.value)
+
+
+def test_create_tasks_round_trip_failure_keeps_created_ids(server):
+    tasks = [(str(n), '') for n in range(BATCH_LIMIT + 5)]
+    server.reply(200, batch_result())
+    server.reply(500)
+    client, sleeps = make_client(server_url(server))
+    with pytest.raises(AzureBoardsError) as info:
+        client.create_tasks(tasks)
+    assert len(info.value.created) == BATCH_LIMIT
+    assert info.value.status == 500
+    # The $batch POST is not sent twice
+    assert len(server.requests) == 2
+    assert sleeps == []
@@ -0,0 +1,23 @@
+import time
+
+import pytest
+
+from mdrender import strip_markdown
+
+
+def test_strip_keeps_text_of_spans():
+    text = 'See [the docs](https://example.com) and ![a chart](chart.png), <b>bold</b> `code`.'
+    assert strip_markdown(text) == 'See the docs and a chart, bold code.'
+
+
+def test_strip_removes_table_delimiter_rows():
+    text = '| a | b | c |\n|---|:-:|--:|\n| 1 | 2 | 3 |'
+    assert strip_markdown(text) == 'a b c\n1 2 3'
+
+
+@pytest.mark.parametrize('opener', ['[a ', '![a ', '<a ', '[a](b ', '[a\n'])
+def test_strip_unclosed_spans_is_linear(opener):
+    # Each unclosed opener used to be looked for up to the end of the text
+    start = time.perf_counter()
+    strip_markdown(opener * 40000)
+    assert time.perf_counter() - start < 1
@@ -0,0 +1,17 @@
+from mdtable import TableData, format_table, parse_table
+
+
+def test_format_table_aligns_escaped_cells():
+    table = TableData(['a', 'b'], [['x|y', 'one\ntwo'], ['1', '2']], ['left', 'right'])
+    assert format_table(table).splitlines() == [
+        '| a          |   b |',
+        '| :--------- | --: |',
+        '| x\\|y       |   1 |',
+        '| one<br>two |   2 |',
+    ]
+
+
+def test_format_table_round_trips():
+    table = parse_table(['| a | b |', '| :-- | --: |', '| x\\|y | 2 |'])
+    assert table.cell(0, 0) == 'x|y'
+    assert parse_table(format_table(table).splitlines()).columns == table.columns
@@ -0,0 +1,53 @@
+import time
+
+from outline import HeadingIndex, fuzzy_pattern
+
+
+def test_headings_skip_fenced_code():
+    index = HeadingIndex('# One\n```\n# not a heading\n```\n## Two\n')
+    assert index.headings() == [(0, 1, 'One'), (4, 2, 'Two')]
+
+
+def test_replace_lines_matches_reset():
+    text = '# One\ntext\n## Two\n'
+    index = HeadingIndex(text)
+    assert index.replace_lines(1, 1, ['```', '## inside', '```', '### Three'])
+    assert index.headings() == HeadingIndex('# One\n```\n## inside\n```\n### Three\n## Two\n').headings()
+
+
+def test_filter_matches_in_order():
+    index = HeadingIndex('# Release notes\n## Editor preview\n## Performance\n')
+    assert [title for _, _, title in index.filter('rel nts')] == ['Release notes']
+    assert [title for _, _, title in index.filter('e')] == ['Release notes', 'Editor preview', 'Performance']
+    assert index.filter('nts rel') == []
+
+
+def test_fuzzy_pattern_escapes_query():
+    assert fuzzy_pattern('a]^-\\').match('xa]y^-z\\')
+    assert not fuzzy_pattern('a]').match('a-')
+
+
+def test_filter_without_match_is_linear():
+    # Queries that nearly match used to backtrack through every placement of their characters
+    titles = ['e' * 110] * 2000
+    index = HeadingIndex('\n'.join('## ' + title for title in titles))
+    single = HeadingIndex('# ' + 'a' * 60)
+    start = time.perf_counter()
+    assert index.filter('eeeeeq') == []
+    assert single.filter('aaaaaaz') == []
+    assert time.perf_counter() - start < 1
+
+
+def test_fenced_block():
+    index = HeadingIndex('# One\n```\ncode\n\ncode\n```\ntext\n~~~\nopen\n')
+    assert index.fenced_block(0) is None
+    assert index.fenced_block(1) == (1, 5)
+    assert index.fenced_block(3) == (1, 5)
+    assert index.fenced_block(5) == (1, 5)
+    assert index.fenced_block(6) is None
+    assert index.fenced_block(8) == (7, None)
+    # Lines added inside the block move its end and the blocks after it
+    assert index.replace_lines(3, 1, ['', 'more', ''])
+    assert index.fenced_block(7) == (1, 7)
+    assert index.fenced_block(9) == (9, None)
+    assert index.fenced_block(8) is None
@@ -0,0 +1,111 @@
+"""Persistent SQLite cache of Azure Boards work items.
+
+Items are keyed by organisation, project and id and shown straight from the
+cache; ``refresh`` then brings stale entries up to date, downloading full
+items only for those whose revision changed on the server.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from paths import user_config_dir
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS work_items (
+    org TEXT NOT NULL,
+    project TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    rev INTEGER,
+    data TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (org, project, id)
+)
+'''
+
+
+def default_cache_path():
+    return os.path.join(user_config_dir(), 'workitems.sqlite3')
+
+
+class WorkItemCache:
+    def __init__(self, path=None, max_items=2000, ttl=600):
+        self.path = path or default_cache_path()
+        self.max_items = max_items
+        # Seconds before a cached item is checked against the server again
+        self.ttl = ttl
+        # Shared between the GUI thread and the refresh worker
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get(self, org, project, work_item_id):
+        """Return ``(item, is_fresh)`` or None when the item was never fetched."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT data, fetched FROM work_items WHERE org=? AND project=? AND id=?',
+                (org, project, int(work_item_id))).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._db.execute('UPDATE work_items SET accessed=? WHERE org=? AND project=? AND id=?',
+                             (now, org, project, int(work_item_id)))
+            self._db.commit()
+        return json.loads(row[0]), now - row[1] < self.ttl
+
+    def put(self, org, project, items):
+        now = time.time()
+        rows = [(org, project, int(item['id']), item.get('rev'), json.dumps(item), now, now) for item in items]
+        with self._lock:
+            self._db.executemany(
+                'INSERT INTO work_items (org, project, id, rev, data, fetched, accessed) VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (org, project, id) DO UPDATE SET rev=excluded.rev, data=excluded.data, fetched=excluded.fetched',
+                rows)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        count = self._db.execute('SELECT COUNT(*) FROM work_items').fetchone()[0]
+        if count > self.max_items:
+            # Least recently looked at go first
+            self._db.execute(
+                'DELETE FROM work_items WHERE rowid IN (SELECT rowid FROM work_items ORDER BY accessed LIMIT ?)',
+                (count - self.max_items,))
+
+    def stale_revisions(self, org, project):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, rev FROM work_items WHERE org=? AND project=? AND fetched<?',
+                (org, project, time.time() - self.ttl)).fetchall()
+        return dict(rows)
+
+    def refresh(self, client):
+        """Bring stale items for ``client``'s project up to date.
+
+        One batch request reads just the revision of every stale item, a
+        second one downloads the items whose revision moved. Returns the ids
+        that changed; items deleted on the server are dropped.
+        """
+        org, project = client.org_url, client.project
+        cached = self.stale_revisions(org, project)
+        if not cached:
+            return []
+        current = {item['id']: item.get('rev') for item in client.get_work_items(cached, fields=['System.Rev'])}
+        changed = [i for i, rev in current.items() if rev != cached.get(i)]
+        items = client.get_work_items(changed) if changed else []
+        now = time.time()
+        with self._lock:
+            unchanged = [(now, org, project, i) for i in current if i not in changed]
+            self._db.executemany('UPDATE work_items SET fetched=? WHERE org=? AND project=? AND id=?', unchanged)
+            gone = [(org, project, i) for i in cached if i not in current]
+            self._db.executemany('DELETE FROM work_items WHERE org=? AND project=? AND id=?', gone)
+            self._db.commit()
+        self.put(org, project, items)
+        return changed
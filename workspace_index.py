@@ -0,0 +1,306 @@
+"""Persistent full-text index over a folder of Markdown files.
+
+An SQLite inverted index: one postings row per (term, file), plus the
+headings and local link targets of every file. ``sync`` brings the index in
+line with the folder by re-reading only files whose size or mtime changed, so
+reopening a workspace costs one directory walk. Writes come from a worker
+thread while the GUI queries, every call takes the same lock.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from urllib.parse import unquote
+
+from batch import find_markdown_files
+from mdrender import FENCE_RE, HEADING_RE
+from paths import user_config_dir
+
+# Bump when tokenizing or link resolution changes, older indexes are rebuilt
+INDEX_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    in_heading INTEGER NOT NULL,
+    PRIMARY KEY (term, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+CREATE TABLE IF NOT EXISTS headings (
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS headings_file ON headings (file_id);
+CREATE TABLE IF NOT EXISTS links (
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    target TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS links_target ON links (target);
+CREATE INDEX IF NOT EXISTS links_file ON links (file_id);
+'''
+
+TERM_RE = re.compile(r'\w{2,64}')
+# [text](target "title") and ![alt](target)
+INLINE_LINK_RE = re.compile(r'\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+["\'(][^)]*)?\)')
+# [label]: target
+LINK_TARGET_DEF_RE = re.compile(r'^ {0,3}\[[^\]]+\]:[ \t]*<?([^\s>]+)')
+EXTERNAL_LINK_RE = re.compile(r'^[A-Za-z][A-Za-z0-9+.-]*:')
+# Files indexed between commits while syncing
+COMMIT_EVERY = 200
+MAX_RESULTS = 200
+
+
+def default_index_path(root):
+    key = hashlib.sha1(os.path.abspath(root).encode('utf-8')).hexdigest()[:16]
+    folder = os.path.join(user_config_dir(), 'workspaces')
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, key + '.sqlite3')
+
+
+def resolve_link(source_path, target):
+    """Workspace-relative path a link in ``source_path`` points at, or None for URLs and anchors."""
+    if EXTERNAL_LINK_RE.match(target) or target.startswith('#'):
+        return None
+    target = unquote(target.split('#', 1)[0].split('?', 1)[0])
+    if not target:
+        return None
+    if target.startswith('/'):
+        path = target.lstrip('/')
+    else:
+        path = os.path.join(os.path.dirname(source_path), target)
+    path = os.path.normpath(path).replace(os.sep, '/')
+    return None if path.startswith('../') else path
+
+
+def parse_markdown(source_path, text):
+    """Return ``(terms, heading_terms, headings, links)`` for one file.
+
+    ``terms`` counts every word, ``headings`` holds ``(line, level, text)``
+    and ``links`` ``(line, target)``; headings and links inside fenced code
+    are ignored.
+    """
+    terms = Counter(TERM_RE.findall(text.lower()))
+    heading_terms = set()
+    headings = []
+    links = []
+    closer = None
+    for lineno, line in enumerate(text.split('\n')):
+        fence = FENCE_RE.match(line)
+        if closer is not None:
+            if fence and fence.group(1)[0] == closer[0] and len(fence.group(1)) >= len(closer) \
+                    and not line.strip().strip(closer[0]):
+                closer = None
+            continue
+        if fence:
+            closer = fence.group(1)
+            continue
+        if line.lstrip(' ').startswith('#'):
+            heading = HEADING_RE.match(line)
+            if heading:
+                title = (heading.group(2) or '').strip()
+                headings.append((lineno, len(heading.group(1)), title))
+                heading_terms.update(TERM_RE.findall(title.lower()))
+        if '[' in line:
+            targets = INLINE_LINK_RE.findall(line)
+            definition = LINK_TARGET_DEF_RE.match(line)
+            if definition:
+                targets.append(definition.group(1))
+            for target in targets:
+                path = resolve_link(source_path, target)
+                if path:
+                    links.append((lineno, path))
+    return terms, heading_terms, headings, links
+
+
+class WorkspaceIndex:
+    def __init__(self, root, path=None):
+        self.root = os.path.abspath(root)
+        self.path = path or default_index_path(self.root)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        if self._db.execute('PRAGMA user_version').fetchone()[0] != INDEX_VERSION:
+            self._db.executescript('DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS postings; '
+                                   'DROP TABLE IF EXISTS headings; DROP TABLE IF EXISTS links;')
+            self._db.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def relative_path(self, path):
+        """Workspace-relative key for ``path``, or None when it lies outside the folder."""
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        if rel.startswith('..'):
+            return None
+        return rel.replace(os.sep, '/')
+
+    def absolute_path(self, rel_path):
+        return os.path.join(self.root, *rel_path.split('/'))
+
+    def file_count(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def _remove(self, rel_path):
+        row = self._db.execute('SELECT id FROM files WHERE path=?', (rel_path,)).fetchone()
+        if row is None:
+            return None
+        for table in ('postings', 'headings', 'links'):
+            self._db.execute(f'DELETE FROM {table} WHERE file_id=?', row)
+        return row[0]
+
+    def _index(self, rel_path, stat):
+        try:
+            with open(self.absolute_path(rel_path), 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        except OSError:
+            return False
+        terms, heading_terms, headings, links = parse_markdown(rel_path, text)
+        with self._lock:
+            file_id = self._remove(rel_path)
+            if file_id is None:
+                file_id = self._db.execute('INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)',
+                                           (rel_path, stat.st_mtime, stat.st_size)).lastrowid
+            else:
+                self._db.execute('UPDATE files SET mtime=?, size=? WHERE id=?', (stat.st_mtime, stat.st_size, file_id))
+            self._db.executemany('INSERT INTO postings (term, file_id, count, in_heading) VALUES (?, ?, ?, ?)',
+                                 [(term, file_id, count, term in heading_terms) for term, count in terms.items()])
+            self._db.executemany('INSERT INTO headings (file_id, line, level, text) VALUES (?, ?, ?, ?)',
+                                 [(file_id, line, level, title) for line, level, title in headings])
+            self._db.executemany('INSERT INTO links (file_id, line, target) VALUES (?, ?, ?)',
+                                 [(file_id, line, target) for line, target in links])
+        return True
+
+    def index_file(self, rel_path):
+        """Re-index one file if it changed on disk; drop it if it is gone. Returns True when anything changed."""
+        try:
+            stat = os.stat(self.absolute_path(rel_path))
+        except OSError:
+            with self._lock:
+                removed = self._remove(rel_path) is not None
+                self._db.execute('DELETE FROM files WHERE path=?', (rel_path,))
+                self._db.commit()
+            return removed
+        with self._lock:
+            row = self._db.execute('SELECT mtime, size FROM files WHERE path=?', (rel_path,)).fetchone()
+        if row == (stat.st_mtime, stat.st_size):
+            return False
+        changed = self._index(rel_path, stat)
+        with self._lock:
+            self._db.commit()
+        return changed
+
+    def sync(self, progress=None, cancelled=None, folders=None, files=None):
+        """Index new and modified files under the root and forget deleted ones.
+
+        ``progress(done, total)`` is called as files are checked. The folders
+        walked and the absolute paths of the Markdown files found are added
+        to the ``folders`` and ``files`` lists if given. Returns the number of
+        files that were (re)indexed or dropped.
+        """
+        with self._lock:
+            known = {path: (mtime, size) for path, mtime, size in self._db.execute('SELECT path, mtime, size FROM files')}
+        paths = [rel.replace(os.sep, '/') for rel in find_markdown_files(self.root, folders)]
+        if files is not None:
+            files.extend(self.absolute_path(rel_path) for rel_path in paths)
+        changed = 0
+        for done, rel_path in enumerate(paths):
+            if cancelled is not None and cancelled():
+                break
+            if progress is not None and done % COMMIT_EVERY == 0:
+                progress(done, len(paths))
+            try:
+                stat = os.stat(self.absolute_path(rel_path))
+            except OSError:
+                continue
+            if known.get(rel_path) == (stat.st_mtime, stat.st_size):
+                continue
+            if self._index(rel_path, stat):
+                changed += 1
+                if changed % COMMIT_EVERY == 0:
+                    with self._lock:
+                        self._db.commit()
+        else:
+            gone = set(known).difference(paths)
+            with self._lock:
+                for rel_path in gone:
+                    self._remove(rel_path)
+                self._db.executemany('DELETE FROM files WHERE path=?', [(p,) for p in gone])
+            changed += len(gone)
+            if progress is not None:
+                progress(len(paths), len(paths))
+        with self._lock:
+            self._db.commit()
+        return changed
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Files containing every word of ``query``, the last word as a prefix.
+
+        Returns ``(path, hits, heading)`` tuples, files whose headings match
+        first, then by number of hits; ``heading`` is the ``(line, text)`` of
+        the first matching heading or None.
+        """
+        words = TERM_RE.findall(query.lower())
+        if not words:
+            return []
+        with self._lock:
+            matches = None
+            for i, word in enumerate(words):
+                if i == len(words) - 1 and not query[-1:].isspace():
+                    rows = self._db.execute(
+                        'SELECT file_id, SUM(count), MAX(in_heading) FROM postings '
+                        'WHERE term >= ? AND term < ? GROUP BY file_id', (word, word + '\uffff'))
+                else:
+                    rows = self._db.execute(
+                        'SELECT file_id, count, in_heading FROM postings WHERE term = ?', (word,))
+                found = {file_id: (count, in_heading) for file_id, count, in_heading in rows}
+                if matches is None:
+                    matches = found
+                else:
+                    matches = {file_id: (hits + found[file_id][0], heading and found[file_id][1])
+                               for file_id, (hits, heading) in matches.items() if file_id in found}
+                if not matches:
+                    return []
+            ranked = sorted(matches.items(), key=lambda item: (-item[1][1], -item[1][0]))[:limit]
+            ids = [file_id for file_id, _ in ranked]
+            marks = ','.join('?' * len(ids))
+            paths = dict(self._db.execute(f'SELECT id, path FROM files WHERE id IN ({marks})', ids))
+            headings = {}
+            heading_ids = [file_id for file_id, (_, in_heading) in ranked if in_heading]
+            if heading_ids:
+                marks = ','.join('?' * len(heading_ids))
+                for file_id, line, title in self._db.execute(
+                        f'SELECT file_id, line, text FROM headings WHERE file_id IN ({marks}) ORDER BY file_id, line',
+                        heading_ids):
+                    title_terms = TERM_RE.findall(title.lower())
+                    if file_id not in headings and any(t.startswith(w) for w in words for t in title_terms):
+                        headings[file_id] = (line, title)
+        return [(paths[file_id], hits, headings.get(file_id)) for file_id, (hits, _) in ranked if file_id in paths]
+
+    def headings(self, rel_path):
+        with self._lock:
+            return self._db.execute(
+                'SELECT h.line, h.level, h.text FROM headings h JOIN files f ON f.id = h.file_id '
+                'WHERE f.path = ? ORDER BY h.line', (rel_path,)).fetchall()
+
+    def backlinks(self, rel_path):
+        """``(path, line)`` of every link in the workspace that points at ``rel_path``."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT f.path, l.line FROM links l JOIN files f ON f.id = l.file_id '
+                'WHERE l.target = ? ORDER BY f.path, l.line', (rel_path,)).fetchall()